@@ -1,23 +1,29 @@
 import os
 from flask import Flask
-from flask_swagger_ui import get_swaggerui_blueprint
-
-from app.config import config
-from app.db import init_db
-from app.rate_limiter import init_limiter
-from app.logging_config import setup_logging
-from app.middleware import setup_middleware
-from app.routes.ticket_routes import ticket_bp
-from app.utils.error_handlers import register_error_handlers
 
 def create_app(config_name=None):
     """Create and configure the Flask application"""
+    # Imported here so that importing the package (CLI entry points, forked
+    # workers, tests) doesn't pay for the blueprints, SQLAlchemy and limiter
+    # until an app is actually built
+    from app.config import config
+    from app.db import init_db
+    from app.json_provider import OrjsonProvider
+    from app.rate_limiter import init_limiter
+    from app.logging_config import setup_logging
+    from app.middleware import setup_middleware
+    from app.routes.ticket_routes import ticket_bp
+    from app.utils.error_handlers import register_error_handlers
+    
     if config_name is None:
         config_name = os.environ.get('FLASK_ENV', 'default')
     
     app = Flask(__name__)
     app.config.from_object(config[config_name])
     
+    # Use orjson for request parsing and jsonify
+    app.json = OrjsonProvider(app)
+    
     # Initialize database
     db = init_db(app)
     
@@ -33,18 +39,22 @@ def create_app(config_name=None):
     # Register blueprints
     app.register_blueprint(ticket_bp)
     
-    # Add Swagger UI
+    # Add Swagger UI (development, or when explicitly enabled)
     SWAGGER_URL = '/api/docs'
     API_URL = '/static/swagger.json'
+    swagger_enabled = app.config['DEBUG'] or app.config['SWAGGER_UI_ENABLED']
     
-    swaggerui_blueprint = get_swaggerui_blueprint(
-        SWAGGER_URL,
-        API_URL,
-        config={
-            'app_name': "Railway Reservation API"
-        }
-    )
-    app.register_blueprint(swaggerui_blueprint, url_prefix=SWAGGER_URL)
+    if swagger_enabled:
+        from flask_swagger_ui import get_swaggerui_blueprint
+        
+        swaggerui_blueprint = get_swaggerui_blueprint(
+            SWAGGER_URL,
+            API_URL,
+            config={
+                'app_name': "Railway Reservation API"
+            }
+        )
+        app.register_blueprint(swaggerui_blueprint, url_prefix=SWAGGER_URL)
     
     # Register error handlers
     register_error_handlers(app)
@@ -52,9 +62,11 @@ def create_app(config_name=None):
     # Create a route for the index
     @app.route('/')
     def index():
-        return {
-            "message": "Welcome to Railway Reservation API",
-            "docs": f"{SWAGGER_URL}"
+        response = {
+            "message": "Welcome to Railway Reservation API"
         }
+        if swagger_enabled:
+            response["docs"] = f"{SWAGGER_URL}"
+        return response
     
     return app
@@ -1,5 +1,5 @@
 import os
-from enum import Enum, auto
+from enum import IntEnum
 
 # Base directory of the application
 BASE_DIR = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
@@ -10,9 +10,32 @@ class Config:
     DEBUG = False
     TESTING = False
     
+    # Swagger UI is always served in debug mode; set ENABLE_SWAGGER_UI=true
+    # to serve it in other environments
+    SWAGGER_UI_ENABLED = os.environ.get('ENABLE_SWAGGER_UI', 'false').lower() == 'true'
+    
+    # Logging: application.json.log and errors.log are always written; the
+    # plain-text application.log is opt-in (TEXT_LOGS_ENABLED=true)
+    TEXT_LOGS_ENABLED = os.environ.get('TEXT_LOGS_ENABLED', 'false').lower() == 'true'
+    
     # SQLAlchemy configuration
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', f"sqlite:///{os.path.join(BASE_DIR, 'railway.db')}")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_pre_ping': True,  # Validate pooled connections on checkout
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_recycle': 1800,  # seconds
+        'pool_timeout': 3  # seconds to wait for a free connection
+    }
+    
+    # Postgres only: fail stuck statements and lock waits fast instead of
+    # pinning a worker (milliseconds)
+    DB_STATEMENT_TIMEOUT = int(os.environ.get('DB_STATEMENT_TIMEOUT', 2000))
+    DB_LOCK_TIMEOUT = int(os.environ.get('DB_LOCK_TIMEOUT', 500))
+    
+    # Statements slower than this are logged as warnings (milliseconds)
+    SLOW_QUERY_THRESHOLD = int(os.environ.get('SLOW_QUERY_THRESHOLD', 100))
     
     # Reservation system constraints
     CONFIRMED_BERTHS = 63
@@ -20,30 +43,79 @@ class Config:
     WAITING_LIST_MAX = 10
     MIN_AGE_FOR_BERTH = 5
     SENIOR_CITIZEN_AGE = 60
+    
+    # Seconds the availability counts served by /available may be reused.
+    # The cache lives in each worker process and only that worker's bookings
+    # and cancellations clear it, so it stays off unless the app runs in a
+    # single process
+    AVAILABILITY_CACHE_TTL = float(os.environ.get('AVAILABILITY_CACHE_TTL', 0))
 
 class DevelopmentConfig(Config):
     DEBUG = True
+    TEXT_LOGS_ENABLED = True
 
 class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    # In-memory SQLite shares one connection (StaticPool), which takes no
+    # pool sizing options
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    AVAILABILITY_CACHE_TTL = 0  # every test starts from a fresh database
 
 class ProductionConfig(Config):
     # Production-specific configuration
     pass
 
-# Enums for statuses and berth types
-class TicketStatus(str, Enum):
-    CONFIRMED = "confirmed"
-    RAC = "rac"
-    WAITING = "waiting"
-    CANCELLED = "cancelled"
-
-class BerthType(str, Enum):
-    LOWER = "lower"
-    MIDDLE = "middle"
-    UPPER = "upper"
-    SIDE_LOWER = "side-lower"
+# Enums for statuses and berth types. Both are stored as small integers; the
+# API speaks in the labels below
+class TicketStatus(IntEnum):
+    CONFIRMED = 1
+    RAC = 2
+    WAITING = 3
+    CANCELLED = 4
+    
+    @property
+    def label(self):
+        return TICKET_STATUS_LABELS[self]
+
+class BerthType(IntEnum):
+    # Codes are in allocation preference order for confirmed berths
+    LOWER = 1
+    MIDDLE = 2
+    UPPER = 3
+    SIDE_LOWER = 4
+    
+    @property
+    def label(self):
+        return BERTH_TYPE_LABELS[self]
+
+# Plain int values for hot comparisons; comparing against these avoids the
+# Enum __eq__ dispatch and they are what the SmallInteger columns store
+CONFIRMED = TicketStatus.CONFIRMED.value
+RAC = TicketStatus.RAC.value
+WAITING = TicketStatus.WAITING.value
+CANCELLED = TicketStatus.CANCELLED.value
+ACTIVE_STATUSES = frozenset({CONFIRMED, RAC, WAITING})
+
+LOWER = BerthType.LOWER.value
+MIDDLE = BerthType.MIDDLE.value
+UPPER = BerthType.UPPER.value
+SIDE_LOWER = BerthType.SIDE_LOWER.value
+CONFIRMED_BERTH_TYPES = frozenset({LOWER, MIDDLE, UPPER})
+
+# Labels used in API responses, keyed by the stored code
+TICKET_STATUS_LABELS = {
+    CONFIRMED: "confirmed",
+    RAC: "rac",
+    WAITING: "waiting",
+    CANCELLED: "cancelled"
+}
+BERTH_TYPE_LABELS = {
+    LOWER: "lower",
+    MIDDLE: "middle",
+    UPPER: "upper",
+    SIDE_LOWER: "side-lower"
+}
 
 # Configuration dictionary
 config = {
@@ -1,12 +1,52 @@
+import time
+
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from sqlalchemy import event
 
 # Initialize SQLAlchemy
 db = SQLAlchemy()
 migrate = Migrate()
 
+# Applied to every new SQLite connection: WAL lets readers run alongside the
+# writer and, with synchronous=NORMAL, commits no longer fsync every time
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",  # ~20 MB page cache
+    "PRAGMA mmap_size=268435456",  # 256 MB
+)
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Tune a freshly opened SQLite connection"""
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+def _log_slow_queries(engine, logger, threshold_ms):
+    """Log a warning for every statement that runs longer than threshold_ms"""
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+    
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _check_elapsed(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info['query_start_time'].pop()) * 1000
+        if elapsed_ms >= threshold_ms:
+            logger.warning("Slow query (%.1f ms): %s", elapsed_ms, statement)
+
 def init_db(app):
     """Initialize the database with the Flask app"""
+    if app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql'):
+        engine_options = dict(app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+        engine_options.setdefault('connect_args', {
+            'options': f"-c statement_timeout={app.config['DB_STATEMENT_TIMEOUT']}"
+                       f" -c lock_timeout={app.config['DB_LOCK_TIMEOUT']}"
+        })
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
+    
     db.init_app(app)
     migrate.init_app(app, db)
     
@@ -16,4 +56,10 @@ def init_db(app):
     from app.models.berth import Berth
     from app.models.berth_allocation_history import BerthAllocationHistory
     
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name == 'sqlite':
+        event.listen(engine, 'connect', _apply_sqlite_pragmas)
+    _log_slow_queries(engine, app.logger, app.config['SLOW_QUERY_THRESHOLD'])
+    
     return db
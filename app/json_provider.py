@@ -0,0 +1,72 @@
+"""
+orjson-backed JSON provider for the Railway Ticket Reservation System
+"""
+import dataclasses
+import decimal
+
+import orjson
+from flask.json.provider import JSONProvider
+
+# Non-string keys (ints, str enums) are converted the way json.dumps does
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+# orjson output is always compact, so these are the only separators it matches
+COMPACT_SEPARATORS = (",", ":")
+
+def _default(obj):
+    """Serialize the types Flask's default provider handles that orjson doesn't"""
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, "__html__"):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+class OrjsonProvider(JSONProvider):
+    """
+    Parse request bodies and serialize responses with orjson.
+    
+    Datetimes, dates, UUIDs, enums and dataclasses are encoded natively by
+    orjson (datetimes as ISO 8601). Keys are emitted in insertion order.
+    """
+    compact = None
+    mimetype = "application/json"
+    
+    def dumps(self, obj, **kwargs):
+        """
+        Serialize data as JSON to a string
+        
+        Accepts the json.dumps arguments orjson has an equivalent for
+        (indent, sort_keys, default, and the compact separators Flask's
+        session serializer passes); any other raises TypeError rather than
+        being silently ignored.
+        """
+        indent = kwargs.pop("indent", None)
+        sort_keys = kwargs.pop("sort_keys", False)
+        default = kwargs.pop("default", None)
+        if tuple(kwargs.get("separators") or COMPACT_SEPARATORS) == COMPACT_SEPARATORS:
+            kwargs.pop("separators", None)
+        if kwargs:
+            raise TypeError(f"Unsupported dumps arguments for orjson: {', '.join(sorted(kwargs))}")
+        return self._dumps(obj, indent=indent, sort_keys=sort_keys, default=default).decode()
+    
+    def loads(self, s, **kwargs):
+        """Deserialize data as JSON from a string or bytes"""
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        """Serialize the arguments straight to a JSON response body"""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(
+            self._dumps(obj, indent=indent) + b"\n", mimetype=self.mimetype
+        )
+    
+    def _dumps(self, obj, indent=None, sort_keys=False, default=None):
+        option = ORJSON_OPTIONS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=default or _default, option=option)
@@ -2,15 +2,180 @@
 Logging configuration for the Railway Ticket Reservation System
 """
 import os
+import atexit
+import queue
 import logging
-from logging.handlers import RotatingFileHandler
-import json
-from datetime import datetime
+import threading
+from logging.handlers import MemoryHandler, QueueHandler, QueueListener, RotatingFileHandler
+from datetime import datetime, timezone
+
+import orjson
 
 # Create logs directory if it doesn't exist
 log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs')
 os.makedirs(log_dir, exist_ok=True)
 
+# Buffered handler settings: records are written in batches, ERROR and above
+# are written immediately, and the buffers are flushed at least this often
+LOG_BUFFER_CAPACITY = 256
+LOG_FLUSH_INTERVAL = 5.0  # seconds
+
+# Request fields copied from a record's extra data into the JSON log
+_EXTRA_KEYS = ('request_id', 'method', 'path', 'status_code', 'elapsed_time', 'remote_addr')
+
+# Buffered handlers installed by the most recent setup_logging call, and the
+# listener that feeds them from the request threads' queue
+_buffered_handlers = []
+_flush_thread = None
+_listener = None
+
+# Set at interpreter exit to stop the periodic flush thread
+_stop_flushing = threading.Event()
+
+def _flush_buffered_handlers():
+    """Write out any records still held in the log buffers"""
+    for handler in list(_buffered_handlers):
+        handler.flush()
+
+def _periodic_flush():
+    """Background loop bounding how long a record can sit in a buffer"""
+    while not _stop_flushing.wait(LOG_FLUSH_INTERVAL):
+        _flush_buffered_handlers()
+
+def _start_flush_thread():
+    """Start the background flush thread once per process"""
+    global _flush_thread
+    if _flush_thread is None:
+        _flush_thread = threading.Thread(target=_periodic_flush, name='log-flush', daemon=True)
+        _flush_thread.start()
+        atexit.register(_shutdown_logging)
+
+def _shutdown_logging():
+    """Stop the flush thread, drain the log queue and flush the buffers at interpreter exit"""
+    _stop_flushing.set()
+    if _flush_thread is not None:
+        _flush_thread.join()
+    if _listener is not None:
+        _listener.stop()
+    _flush_buffered_handlers()
+
+def _buffered(handler):
+    """Wrap a file handler in a MemoryHandler that writes in batches"""
+    buffered_handler = MemoryHandler(
+        capacity=LOG_BUFFER_CAPACITY,
+        flushLevel=logging.ERROR,
+        target=handler,
+        flushOnClose=True
+    )
+    # MemoryHandler.flush bypasses the target's level check, so filter here
+    buffered_handler.setLevel(handler.level)
+    return buffered_handler
+
+class _InProcessQueueHandler(QueueHandler):
+    """
+    QueueHandler for a queue that never leaves the process.
+    
+    The stdlib version formats the whole record so it can be pickled; here only
+    the message is rendered on the request thread (so mutable args are captured
+    as they were), and exc_info is kept for the formatters on the listener thread.
+    """
+    def prepare(self, record):
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+def _json_value(value):
+    """Encode a single value as JSON text; unknown types fall back to str()"""
+    return orjson.dumps(value, default=str, option=orjson.OPT_UTC_Z).decode()
+
+class JsonFormatter(logging.Formatter):
+    """
+    JSON formatter for structured logging.
+    
+    Records always carry the same leading fields in the same order, so the
+    object is filled into a template prepared once per formatter instead of
+    being built as a dict and encoded key by key.
+    """
+    def __init__(self):
+        super().__init__()
+        self._template = '{"timestamp":%s,"level":"%s","message":%s,"module":%s,"function":%s,"line":%d%s}'
+        self._extra_prefixes = tuple((key, f',"{key}":') for key in _EXTRA_KEYS)
+    
+    def format(self, record):
+        try:
+            # Request fields passed as extra, then exception info if available
+            extra = record.__dict__
+            fields = ''.join(
+                prefix + _json_value(extra[key])
+                for key, prefix in self._extra_prefixes
+                if key in extra
+            )
+            if record.exc_info:
+                fields += ',"exception":' + _json_value(self.formatException(record.exc_info))
+            
+            return self._template % (
+                _json_value(datetime.fromtimestamp(record.created, timezone.utc)),
+                record.levelname,
+                _json_value(record.getMessage()),
+                _json_value(record.module),
+                _json_value(record.funcName),
+                record.lineno,
+                fields
+            )
+        except Exception:
+            # Fallback to a basic log format if JSON encoding fails
+            return orjson.dumps({
+                "timestamp": datetime.fromtimestamp(record.created, timezone.utc),
+                "level": "ERROR",
+                "message": "Failed to encode log record",
+                "original_message": str(record.getMessage())
+            }, option=orjson.OPT_UTC_Z).decode()
+
+class FastJsonRotatingHandler(RotatingFileHandler):
+    """
+    Size-rotated file handler that writes with os.write on a raw descriptor.
+    
+    Each formatted line goes out in a single write syscall (which releases the
+    GIL) instead of through a buffered text stream and an explicit flush.
+    """
+    def __init__(self, filename, maxBytes=0, backupCount=0):
+        self._fd = None
+        # The descriptor is opened on first emit; self.stream is never used
+        super().__init__(filename, maxBytes=maxBytes, backupCount=backupCount, delay=True)
+    
+    def _open(self):
+        return os.open(self.baseFilename, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    
+    def _close_fd(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+    
+    def emit(self, record):
+        try:
+            data = (self.format(record) + '\n').encode('utf-8')
+            if self._fd is None:
+                self._fd = self._open()
+            if self.maxBytes > 0 and os.fstat(self._fd).st_size + len(data) >= self.maxBytes:
+                self.doRollover()
+                self._fd = self._open()
+            os.write(self._fd, data)
+        except Exception:
+            self.handleError(record)
+    
+    def doRollover(self):
+        self._close_fd()
+        super().doRollover()
+    
+    def close(self):
+        self.acquire()
+        try:
+            self._close_fd()
+        finally:
+            self.release()
+        super().close()
+
 # Configure loggers
 def setup_logging(app):
     """
@@ -27,60 +192,15 @@ def setup_logging(app):
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
     
-    # JSON formatter for structured logging
-    class JsonFormatter(logging.Formatter):
-        def format(self, record):
-            # Create a basic log record with only the essential fields
-            log_record = {
-                "timestamp": datetime.utcnow().isoformat(),
-                "level": record.levelname,
-                "message": record.getMessage(),
-                "module": record.module,
-                "function": record.funcName,
-                "line": record.lineno
-            }
-            
-            # Add exception info if available
-            if record.exc_info:
-                log_record["exception"] = str(self.formatException(record.exc_info))
-            
-            # Add extra fields safely
-            if hasattr(record, 'request_id'):
-                log_record["request_id"] = record.request_id
-            
-            if hasattr(record, 'method'):
-                log_record["method"] = record.method
-                
-            if hasattr(record, 'path'):
-                log_record["path"] = record.path
-                
-            if hasattr(record, 'status_code'):
-                log_record["status_code"] = record.status_code
-                
-            if hasattr(record, 'elapsed_time'):
-                log_record["elapsed_time"] = record.elapsed_time
-            
-            # Use safer JSON encoding with simple error handling
-            try:
-                return json.dumps(log_record, default=str)
-            except Exception:
-                # Fallback to a basic log format if JSON encoding fails
-                return json.dumps({
-                    "timestamp": datetime.utcnow().isoformat(),
-                    "level": "ERROR",
-                    "message": "Failed to encode log record",
-                    "original_message": str(record.getMessage())
-                })
-    
     # Create handlers
-    # File handler for all logs
-    all_logs_handler = RotatingFileHandler(
-        os.path.join(log_dir, 'application.log'),
+    # JSON handler for structured logging; this is the complete log
+    json_logs_handler = FastJsonRotatingHandler(
+        os.path.join(log_dir, 'application.json.log'),
         maxBytes=10 * 1024 * 1024,  # 10 MB
         backupCount=10
     )
-    all_logs_handler.setLevel(log_level)
-    all_logs_handler.setFormatter(formatter)
+    json_logs_handler.setLevel(log_level)
+    json_logs_handler.setFormatter(JsonFormatter())
     
     # File handler for errors only
     error_logs_handler = RotatingFileHandler(
@@ -91,28 +211,54 @@ def setup_logging(app):
     error_logs_handler.setLevel(logging.ERROR)
     error_logs_handler.setFormatter(formatter)
     
-    # JSON handler for structured logging
-    json_logs_handler = RotatingFileHandler(
-        os.path.join(log_dir, 'application.json.log'),
-        maxBytes=10 * 1024 * 1024,  # 10 MB
-        backupCount=10
-    )
-    json_logs_handler.setLevel(log_level)
-    json_logs_handler.setFormatter(JsonFormatter())
+    file_handlers = [json_logs_handler, error_logs_handler]
+    
+    # Plain-text copy of all logs, only when enabled: it duplicates the JSON
+    # log and costs an extra format and write per record
+    if app.config.get('TEXT_LOGS_ENABLED', False):
+        all_logs_handler = RotatingFileHandler(
+            os.path.join(log_dir, 'application.log'),
+            maxBytes=10 * 1024 * 1024,  # 10 MB
+            backupCount=10
+        )
+        all_logs_handler.setLevel(log_level)
+        all_logs_handler.setFormatter(formatter)
+        file_handlers.append(all_logs_handler)
+    
+    global _listener
+    
+    # Stop the previous listener (draining its queue) before replacing handlers
+    if _listener is not None:
+        _listener.stop()
+    
+    # Buffer writes to each file, replacing handlers from any earlier setup
+    for old_handler in _buffered_handlers:
+        target = old_handler.target
+        old_handler.close()
+        target.close()
+    _buffered_handlers[:] = [_buffered(handler) for handler in file_handlers]
+    _start_flush_thread()
+    
+    # Request threads only enqueue records; formatting and file I/O happen on
+    # the listener's background thread
+    log_queue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, *_buffered_handlers, respect_handler_level=True)
+    _listener.start()
+    queue_handler = _InProcessQueueHandler(log_queue)
     
     # Add handlers to Flask logger
     app.logger.handlers = []
-    app.logger.addHandler(all_logs_handler)
-    app.logger.addHandler(error_logs_handler)
-    app.logger.addHandler(json_logs_handler)
+    app.logger.addHandler(queue_handler)
     app.logger.setLevel(log_level)
-    
+
+    # The root logger writes to the same handlers, so stop app records from
+    # propagating there and being formatted and written a second time
+    app.logger.propagate = False
+
     # Also set up root logger for packages
     root_logger = logging.getLogger()
     root_logger.handlers = []
-    root_logger.addHandler(all_logs_handler)
-    root_logger.addHandler(error_logs_handler)
-    root_logger.addHandler(json_logs_handler)
+    root_logger.addHandler(queue_handler)
     root_logger.setLevel(log_level)
     
     # Set SQLAlchemy logging level
@@ -1,9 +1,27 @@
 """
 Middleware for the Railway Ticket Reservation System
 """
+import itertools
+import logging
+import os
 import time
-import uuid
-from flask import request, g, current_app
+
+# Request IDs only need to be unique within this process for log correlation,
+# so a worker tag plus a counter replaces a uuid4 (CSPRNG read + formatting)
+_worker_tag = os.getpid() & 0xFFFF
+_request_counter = itertools.count()
+
+def _reset_request_ids():
+    """Give a forked worker its own tag and counter"""
+    global _worker_tag, _request_counter
+    _worker_tag = os.getpid() & 0xFFFF
+    _request_counter = itertools.count()
+
+os.register_at_fork(after_in_child=_reset_request_ids)
+
+def generate_request_id():
+    """Return a process-unique ID for correlating a request's log records"""
+    return f"{_worker_tag:04x}-{next(_request_counter):x}"
 
 class RequestLoggingMiddleware:
     """Middleware for logging all requests"""
@@ -14,7 +32,7 @@ class RequestLoggingMiddleware:
         
     def __call__(self, environ, start_response):
         # Generate a unique request ID
-        request_id = str(uuid.uuid4())
+        request_id = generate_request_id()
         
         # Record start time
         start_time = time.time()
@@ -22,31 +40,35 @@ class RequestLoggingMiddleware:
         # Extract simple request data
         path = environ.get('PATH_INFO', '')
         method = environ.get('REQUEST_METHOD', '')
-        remote_addr = environ.get('REMOTE_ADDR', '')
-        query_string = environ.get('QUERY_STRING', '')
+        
+        # Flask's logger doesn't need an app context, and the extra data is
+        # only worth building when INFO records will actually be emitted
+        logger = self.app.logger
+        info_enabled = logger.isEnabledFor(logging.INFO)
         
         # Log the request with only the essential information
-        with self.app.app_context():
-            self.app.logger.info(
-                f"Request started: {method} {path}",
+        if info_enabled:
+            logger.info(
+                "Request started: %s %s", method, path,
                 extra={
                     'request_id': request_id,
                     'method': method,
                     'path': path,
-                    'remote_addr': remote_addr,
-                    'query_string': query_string
+                    'remote_addr': environ.get('REMOTE_ADDR', ''),
+                    'query_string': environ.get('QUERY_STRING', '')
                 }
             )
         
         # Process the request
         def custom_start_response(status, headers, exc_info=None):
             # Log the response with only the essential information
-            status_code = status.split(' ')[0]
-            elapsed_time = time.time() - start_time
-            
-            with self.app.app_context():
-                self.app.logger.info(
-                    f"Request completed: {method} {path} - Status: {status_code} - Time: {elapsed_time:.3f}s",
+            if info_enabled:
+                status_code = status.split(' ')[0]
+                elapsed_time = time.time() - start_time
+                
+                logger.info(
+                    "Request completed: %s %s - Status: %s - Time: %.3fs",
+                    method, path, status_code, elapsed_time,
                     extra={
                         'request_id': request_id,
                         'method': method,
@@ -63,17 +85,16 @@ class RequestLoggingMiddleware:
             # Call the original WSGI app to avoid recursion
             return self.wsgi_app(environ, custom_start_response)
         except Exception as e:
-            with self.app.app_context():
-                self.app.logger.error(
-                    f"Request failed: {method} {path}",
-                    extra={
-                        'request_id': request_id,
-                        'method': method,
-                        'path': path,
-                        'error': str(e)
-                    },
-                    exc_info=True
-                )
+            logger.error(
+                "Request failed: %s %s", method, path,
+                extra={
+                    'request_id': request_id,
+                    'method': method,
+                    'path': path,
+                    'error': str(e)
+                },
+                exc_info=True
+            )
             raise
 
 def setup_middleware(app):
@@ -1,12 +1,24 @@
 from app.db import db
-from app.config import BerthType
+from app.config import BERTH_TYPE_LABELS
 
 class Berth(db.Model):
     __tablename__ = 'berths'
+    __table_args__ = (
+        # Free-berth lookups filter on type and take the lowest ids first;
+        # partial, so only free berths are kept in the index
+        db.Index(
+            'ix_berth_free', 'berth_type', 'id',
+            postgresql_where=db.text('is_allocated = false'),
+            sqlite_where=db.text('is_allocated = 0')
+        ),
+        # A passenger holds at most one berth; a second allocation means two
+        # transactions raced for the same passenger
+        db.UniqueConstraint('passenger_id', name='uq_berth_passenger'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    berth_type = db.Column(db.String(20), nullable=False)
-    is_allocated = db.Column(db.Boolean, default=False)
+    berth_type = db.Column(db.SmallInteger, nullable=False)  # BerthType code
+    is_allocated = db.Column(db.Boolean, default=False, index=True)
     
     # Foreign key
     passenger_id = db.Column(db.Integer, db.ForeignKey('passengers.id'), nullable=True)
@@ -15,4 +27,4 @@ class Berth(db.Model):
     allocation_history = db.relationship('BerthAllocationHistory', backref='berth', lazy=True)
     
     def __repr__(self):
-        return f"<Berth {self.id} - {self.berth_type} - {'Allocated' if self.is_allocated else 'Free'}>"
+        return f"<Berth {self.id} - {BERTH_TYPE_LABELS.get(self.berth_type, self.berth_type)} - {'Allocated' if self.is_allocated else 'Free'}>"
@@ -1,15 +1,23 @@
-from datetime import datetime
+from sqlalchemy.orm import deferred
 from app.db import db
+from app.utils.timestamps import epoch_ms, from_epoch_ms
 
 class BerthAllocationHistory(db.Model):
     __tablename__ = 'berth_allocation_history'
     
     id = db.Column(db.Integer, primary_key=True)
-    ticket_id = db.Column(db.Integer, db.ForeignKey('tickets.id'), nullable=False)
-    berth_id = db.Column(db.Integer, db.ForeignKey('berths.id'), nullable=True)  # Can be null for waiting list
-    rac_position = db.Column(db.Integer, nullable=True)
-    waiting_position = db.Column(db.Integer, nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    ticket_id = db.Column(db.Integer, db.ForeignKey('tickets.id'), nullable=False, index=True)
+    berth_id = db.Column(db.Integer, db.ForeignKey('berths.id'), nullable=True, index=True)  # Can be null for waiting list
+    
+    # Audit details, loaded only when accessed
+    rac_position = deferred(db.Column(db.Integer, nullable=True), group='audit')
+    waiting_position = deferred(db.Column(db.Integer, nullable=True), group='audit')
+    created_at = deferred(db.Column(db.BigInteger, nullable=False, default=epoch_ms, index=True), group='audit')  # epoch milliseconds
+    
+    @property
+    def created(self):
+        """Creation time as a UTC datetime"""
+        return from_epoch_ms(self.created_at)
     
     def __repr__(self):
         return f"<BerthAllocationHistory {self.id} - Ticket: {self.ticket_id}, Berth: {self.berth_id}>"
@@ -1,22 +1,31 @@
+from sqlalchemy.orm import deferred
 from app.db import db
 
 class Passenger(db.Model):
     __tablename__ = 'passengers'
+    __table_args__ = (
+        # Passengers of a ticket, optionally only those old enough for a berth
+        db.Index('ix_passenger_ticket_age', 'ticket_id', 'age'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     age = db.Column(db.Integer, nullable=False)
     gender = db.Column(db.String(10), nullable=False)
-    child = db.Column(db.Boolean, default=False)
+    # Only written at booking time; listings work from age and children
+    child = deferred(db.Column(db.Boolean, default=False))
     
     # Foreign keys
     parent_id = db.Column(db.Integer, db.ForeignKey('passengers.id'), nullable=True)
     ticket_id = db.Column(db.Integer, db.ForeignKey('tickets.id'), nullable=False)
     
-    # Self-referential relationship for parent-child
+    # Self-referential relationship for parent-child; selectin loads the
+    # children of every passenger in a query with one extra SELECT, so
+    # is_lady_with_child doesn't lazy-load per passenger
     children = db.relationship('Passenger', 
                              backref=db.backref('parent', remote_side=[id]),
-                             cascade="all, delete-orphan")
+                             cascade="all, delete-orphan",
+                             lazy='selectin')
     
     # Relationship with berths
     berth = db.relationship('Berth', backref='passenger', uselist=False)
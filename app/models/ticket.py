@@ -1,21 +1,35 @@
-from datetime import datetime
 from app.db import db
-from app.config import TicketStatus
+from app.config import CONFIRMED, TICKET_STATUS_LABELS
+from app.utils.timestamps import epoch_ms, from_epoch_ms
+
+# Sources of RAC and waiting list positions on databases with sequences;
+# created by db.create_all() along with the tables
+rac_position_seq = db.Sequence('rac_position_seq', metadata=db.metadata)
+waiting_position_seq = db.Sequence('waiting_position_seq', metadata=db.metadata)
 
 class Ticket(db.Model):
     __tablename__ = 'tickets'
+    __table_args__ = (
+        # RAC/waiting counts and promotions filter on status, oldest first
+        db.Index('ix_ticket_status_time', 'status', 'booking_time'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    status = db.Column(db.String(20), nullable=False, default=TicketStatus.CONFIRMED)
-    booking_time = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    status = db.Column(db.SmallInteger, nullable=False, default=CONFIRMED)  # TicketStatus code
+    booking_time = db.Column(db.BigInteger, nullable=False, default=epoch_ms, index=True)  # epoch milliseconds
     
     # Relationships
     passengers = db.relationship('Passenger', backref='ticket', lazy=True, cascade="all, delete-orphan")
     berth_allocation_history = db.relationship('BerthAllocationHistory', backref='ticket', lazy=True, cascade="all, delete-orphan")
     
     # Add RAC and Waiting List position tracking
-    rac_position = db.Column(db.Integer, nullable=True)
-    waiting_position = db.Column(db.Integer, nullable=True)
+    rac_position = db.Column(db.Integer, nullable=True, index=True)
+    waiting_position = db.Column(db.Integer, nullable=True, index=True)
+    
+    @property
+    def booked_at(self):
+        """Booking time as a UTC datetime"""
+        return from_epoch_ms(self.booking_time)
     
     def __repr__(self):
-        return f"<Ticket {self.id} - {self.status}>"
+        return f"<Ticket {self.id} - {TICKET_STATUS_LABELS.get(self.status, self.status)}>"
@@ -1,11 +1,17 @@
-from flask import Blueprint, request, jsonify, current_app
-from app.services.ticket_service import TicketService
+import orjson
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
+from app.services.ticket_service import TicketService, BOOKED_STATUSES
 from app.db import db
 from app.rate_limiter import limiter
 from app.utils.error_handlers import ValidationError
-import uuid
+from app.middleware import generate_request_id
+from app.json_provider import ORJSON_OPTIONS
+from app.config import TICKET_STATUS_LABELS
 import time
 
+# Fields every passenger in a booking request must provide
+_REQUIRED_PASSENGER_KEYS = frozenset(('name', 'age', 'gender'))
+
 # Create a blueprint for ticket routes
 ticket_bp = Blueprint('tickets', __name__, url_prefix='/api/v1/tickets')
 
@@ -14,10 +20,10 @@ ticket_bp = Blueprint('tickets', __name__, url_prefix='/api/v1/tickets')
 def health_check():
     """Health check endpoint for monitoring systems"""
     try:
-        # Check database connection
-        from sqlalchemy import text
-        db.session.execute(text('SELECT 1'))
-        db.session.commit()  # Add commit to ensure the connection is tested properly
+        # Check database connection on a pooled connection, bypassing the
+        # ORM session (there is nothing to commit for a SELECT)
+        with db.engine.connect() as connection:
+            connection.exec_driver_sql('SELECT 1')
         current_app.logger.info("Health check passed")
         return jsonify({
             "status": "healthy",
@@ -35,16 +41,16 @@ def health_check():
 @limiter.limit("100 per hour")  # More permissive limit for testing
 def book_ticket():
     """Book a new ticket"""
-    request_id = str(uuid.uuid4())
+    request_id = generate_request_id()
     start_time = time.time()
     
     current_app.logger.info(f"Booking ticket request received [request_id={request_id}]")
     
-    if not request.is_json:
+    # Parse the body once; None means it wasn't a (valid) JSON request
+    data = request.get_json(silent=True)
+    if data is None:
         current_app.logger.warning(f"Non-JSON request received [request_id={request_id}]")
         return jsonify({"error": "Request must be JSON"}), 400
-        
-    data = request.get_json()
     
     # Validate input
     if 'passengers' not in data or not isinstance(data['passengers'], list) or not data['passengers']:
@@ -53,14 +59,14 @@ def book_ticket():
         
     # Validate each passenger
     for passenger in data['passengers']:
-        if not all(key in passenger for key in ['name', 'age', 'gender']):
+        if not isinstance(passenger, dict) or not _REQUIRED_PASSENGER_KEYS <= passenger.keys():
             current_app.logger.warning(f"Invalid passenger data: missing required fields [request_id={request_id}]")
             raise ValidationError("Each passenger must have name, age and gender", field="passenger_data")
             
         try:
             # Convert age to integer
             passenger['age'] = int(passenger['age'])
-        except ValueError:
+        except (ValueError, TypeError):
             current_app.logger.warning(f"Invalid passenger age [request_id={request_id}]")
             raise ValidationError("Age must be a valid number", field="age")
     
@@ -83,12 +89,54 @@ def cancel_ticket(ticket_id):
     response, status_code = TicketService.cancel_ticket(ticket_id)
     return jsonify(response), status_code
 
+def _stream_booked_tickets(tickets):
+    """
+    Encode the booked-tickets listing piece by piece
+    
+    Produces {"confirmed": [...], "rac": [...], "waiting": [...], "summary": {...}}
+    one ticket at a time, so the full listing is never held in memory. The
+    200 status is already sent by the time the tickets are read, so a failure
+    part way through closes the document with an "error" field instead of
+    cutting it off.
+    """
+    summary = {"confirmed_count": 0, "rac_count": 0, "waiting_count": 0, "total_count": 0}
+    in_section = False
+    
+    yield b'{'
+    try:
+        pending = next(tickets, None)
+        for status in BOOKED_STATUSES:
+            label = TICKET_STATUS_LABELS[status]
+            yield b'"' + label.encode() + b'":['
+            in_section = True
+            separator = b''
+            while pending is not None and pending[0] == status:
+                yield separator + orjson.dumps(pending[1], option=ORJSON_OPTIONS)
+                separator = b','
+                summary[f"{label}_count"] += 1
+                summary["total_count"] += 1
+                pending = next(tickets, None)
+            in_section = False
+            yield b'],'
+        if pending is not None:
+            raise ValueError(f"Ticket {pending[1]['ticket_id']} is out of status order")
+    except Exception as e:
+        current_app.logger.error("Booked tickets listing failed part way through: %s", e)
+        yield (b'],' if in_section else b'') + b'"error":"Listing incomplete",'
+    yield b'"summary":' + orjson.dumps(summary) + b'}\n'
+
 @ticket_bp.route('/booked', methods=['GET'])
 @limiter.limit("200 per hour")  # More permissive limit for testing
 def get_booked_tickets():
     """Get all booked tickets"""
-    response, status_code = TicketService.get_booked_tickets()
-    return jsonify(response), status_code
+    try:
+        tickets = TicketService.iter_booked_tickets()
+    except Exception as e:
+        return jsonify({"error": f"Error: {str(e)}"}), 500
+    return Response(
+        stream_with_context(_stream_booked_tickets(tickets)),
+        mimetype='application/json'
+    )
 
 @ticket_bp.route('/available', methods=['GET'])
 @limiter.limit("200 per hour")  # More permissive limit for testing
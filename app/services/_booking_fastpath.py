@@ -0,0 +1,51 @@
+"""
+Pure-Python helpers on the booking hot path.
+
+Kept free of ORM and Flask objects and fully annotated so the module can be
+compiled with mypyc (``mypyc app/services/_booking_fastpath.py``); the
+interpreted module behaves the same.
+"""
+from typing import Any, Dict, List, Tuple
+
+def passenger_rows(passengers_data: List[Dict[str, Any]], ticket_id: int, min_age: int) -> List[Dict[str, Any]]:
+    """
+    Build the Passenger INSERT parameters for a booking request
+    
+    Args:
+        passengers_data: Validated passenger dictionaries from the request
+        ticket_id: ID of the ticket the passengers belong to
+        min_age: Minimum age for a berth; younger passengers are children
+    """
+    rows: List[Dict[str, Any]] = []
+    for passenger_data in passengers_data:
+        age: int = passenger_data['age']
+        rows.append({
+            "name": passenger_data['name'],
+            "age": age,
+            "gender": passenger_data['gender'],
+            "child": age < min_age,
+            "ticket_id": ticket_id
+        })
+    return rows
+
+def priority_order(ages: List[int], seniors: List[bool], ladies_with_child: List[bool]) -> List[int]:
+    """
+    Order passengers for berth allocation
+    
+    Seniors come first, then ladies with children, then everyone else; within
+    each group older passengers go first, and ties keep their request order.
+    
+    Returns:
+        Passenger indexes in allocation order
+    """
+    keys: List[Tuple[int, int, int]] = []
+    for i in range(len(ages)):
+        if seniors[i]:
+            group = -1
+        elif ladies_with_child[i]:
+            group = 0
+        else:
+            group = 1
+        keys.append((group, -ages[i], i))
+    keys.sort()
+    return [key[2] for key in keys]
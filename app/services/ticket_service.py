@@ -1,128 +1,189 @@
-from typing import List, Dict, Any, Tuple, Optional
-from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import and_, func
+import itertools
+import time
+from typing import List, Dict, Any, Tuple, Optional, Iterator
+from flask import current_app
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from sqlalchemy import case, func, text
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.exc import StaleDataError
 
 from app.db import db
-from app.models.ticket import Ticket
+from app.models.ticket import Ticket, rac_position_seq, waiting_position_seq
 from app.models.passenger import Passenger
 from app.models.berth import Berth
 from app.models.berth_allocation_history import BerthAllocationHistory
-from app.config import TicketStatus, BerthType, Config
+from app.config import (
+    TicketStatus, BerthType, Config,
+    CONFIRMED, RAC, WAITING, CANCELLED, LOWER, MIDDLE, UPPER, SIDE_LOWER, CONFIRMED_BERTH_TYPES,
+    TICKET_STATUS_LABELS, BERTH_TYPE_LABELS
+)
+from app.services._booking_fastpath import passenger_rows, priority_order
+from app.utils.timestamps import from_epoch_ms
+from app.utils.retry import retry_on_concurrency
 from app.utils.error_handlers import (
     ResourceNotFoundError, 
     NoAvailabilityError, 
     ValidationError,
     ConcurrencyError,
-    DatabaseError
+    DatabaseError,
+    is_berth_contention
+)
+
+# Statuses listed by /booked, in the order their sections appear; the
+# listing is sorted with an explicit CASE so it doesn't depend on the codes
+BOOKED_STATUSES = (CONFIRMED, RAC, WAITING)
+_BOOKED_STATUS_ORDER = case(
+    {status: rank for rank, status in enumerate(BOOKED_STATUSES)},
+    value=Ticket.status
 )
 
+# Key of the Postgres advisory lock that serializes changes to the coach's
+# berths, RAC queue and waiting list
+COACH_LOCK_KEY = 0x7469636B  # 'tick'
+
+# Availability snapshot served by get_available_tickets; a stale read is fine
+# there, and bookings and cancellations in this process clear it. Other
+# workers can't, so it is disabled unless AVAILABILITY_CACHE_TTL is set
+_STATUS_TTL = 0.0
+_status_cache = {'data': None, 'ts': 0.0}
+
+def _invalidate_status_cache() -> None:
+    _status_cache['ts'] = 0.0
+
 class TicketService:
     """Service for handling ticket booking and cancellation operations"""
     
     @staticmethod
+    def _lock_coach() -> None:
+        """
+        Take the coach lock for the rest of the transaction
+        
+        On Postgres this is a transaction-scoped advisory lock, released
+        automatically at commit or rollback. SQLite only allows one writer at
+        a time, so there is nothing to do there.
+        """
+        if db.session.get_bind().dialect.name == 'postgresql':
+            db.session.execute(
+                text("SELECT pg_advisory_xact_lock(:key)"),
+                {"key": COACH_LOCK_KEY}
+            )
+    
+    @staticmethod
+    @retry_on_concurrency(max_attempts=3)
     def book_ticket(passengers_data: List[Dict[str, Any]]) -> Tuple[Dict, int]:
         """
         Book a ticket for a list of passengers
         
+        A booking that loses a race for a berth is retried from the start;
+        if it keeps losing, ConcurrencyError is raised.
+        
         Args:
             passengers_data: List of passenger data dictionaries
         
         Returns:
             Tuple containing response data and HTTP status code
         """
+        min_age = Config.MIN_AGE_FOR_BERTH  # read in the per-passenger loops below
         try:
-            # Start a transaction
-            db.session.begin_nested()
+            # Everything below runs in the session's single transaction, with
+            # one commit at the end (or a rollback on error)
             
             # First, check if we have enough space in the system
             # Count passengers who need berths (age >= 5)
-            passengers_needing_berths = [p for p in passengers_data if p.get('age', 0) >= Config.MIN_AGE_FOR_BERTH]
+            passengers_needing_berths = [p for p in passengers_data if p.get('age', 0) >= min_age]
             
             if not passengers_needing_berths:
                 raise ValidationError("At least one passenger must be 5 years or older", field="passengers")
                 
             num_berths_needed = len(passengers_needing_berths)
             
-            # Lock rows for update to prevent race conditions
-            current_status = TicketService._get_current_status(for_update=True)
+            # Serialize with other bookings and cancellations
+            TicketService._lock_coach()
+            current_status = TicketService._get_current_status()
             
             # Determine if we can accommodate the request
             if current_status['waiting_list_available'] == 0 and num_berths_needed > current_status['confirmed_available'] + current_status['rac_available']:
                 raise NoAvailabilityError("No tickets available for the requested number of passengers")
             
-            # Create a new ticket
-            ticket = Ticket()
-            db.session.add(ticket)
-            db.session.flush()  # Get the ticket ID
-            
-            # Process parent passengers first, then children
-            parent_map = {}  # To store parent IDs for children
+            # Insert the ticket, then all passengers in one INSERT; RETURNING
+            # gives back the persistent objects with their IDs, in order
+            ticket = db.session.scalar(db.insert(Ticket).returning(Ticket))
+            created_passengers = db.session.scalars(
+                db.insert(Passenger).returning(Passenger, sort_by_parameter_order=True),
+                passenger_rows(passengers_data, ticket.id, min_age)
+            ).all()
             
-            # First process all passengers
-            for passenger_data in passengers_data:
-                passenger = Passenger(
-                    name=passenger_data['name'],
-                    age=passenger_data['age'],
-                    gender=passenger_data['gender'],
-                    child=passenger_data['age'] < Config.MIN_AGE_FOR_BERTH,
-                    ticket_id=ticket.id
-                )
-                
-                db.session.add(passenger)
-                db.session.flush()  # Get the passenger ID
-                
-                # Store parent information for linking children later
+            # Store parent information for linking children
+            parent_map = {}
+            passengers_by_key = {}  # (name, age) -> first passenger created with them
+            children_by_parent = {}
+            for passenger_data, passenger in zip(passengers_data, created_passengers):
+                passengers_by_key.setdefault((passenger.name, passenger.age), passenger)
+                children_by_parent[passenger] = []
                 if passenger_data.get('is_parent', False):
-                    parent_map[passenger_data.get('parent_identifier', '')] = passenger.id
+                    parent_map[passenger_data.get('parent_identifier', '')] = passenger
                 
-            # Now link children to parents
+            # Now link children to parents; parent_id is written by the next flush
             for passenger_data in passengers_data:
                 if passenger_data.get('parent_identifier') and not passenger_data.get('is_parent', False):
-                    parent_id = parent_map.get(passenger_data.get('parent_identifier'))
-                    if parent_id:
-                        # Find this passenger and update parent_id
-                        child_passenger = Passenger.query.filter_by(
-                            name=passenger_data['name'],
-                            age=passenger_data['age'],
-                            ticket_id=ticket.id
-                        ).first()
+                    parent = parent_map.get(passenger_data.get('parent_identifier'))
+                    if parent:
+                        child_passenger = passengers_by_key.get((passenger_data['name'], passenger_data['age']))
                         if child_passenger:
-                            child_passenger.parent_id = parent_id
+                            child_passenger.parent_id = parent.id
+                            children_by_parent[parent].append(child_passenger)
+            
+            # The passengers are new, so their children are exactly the ones
+            # linked above; setting the collections spares is_lady_with_child
+            # a lazy load per passenger
+            for passenger, children in children_by_parent.items():
+                set_committed_value(passenger, 'children', children)
             
             # Now handle berth allocation based on availability
-            passengers_for_berths = Passenger.query.filter(
-                and_(
-                    Passenger.ticket_id == ticket.id,
-                    Passenger.age >= Config.MIN_AGE_FOR_BERTH
-                )
-            ).all()
+            passengers_for_berths = [p for p in created_passengers if p.age >= min_age]
             
             # Allocate berths based on priority
-            result = TicketService._allocate_berths(ticket, passengers_for_berths)
+            result = TicketService._allocate_berths(ticket, passengers_for_berths, current_status)
             
             # Commit the transaction
             db.session.commit()
+            _invalidate_status_cache()
+            
+            # Load the passengers and their berths in one query for the response
+            passengers = Passenger.query.options(
+                joinedload(Passenger.berth)
+            ).filter_by(ticket_id=ticket.id).order_by(Passenger.id).all()
             
             # Prepare response data
             response_data = {
                 "ticket_id": ticket.id,
-                "status": ticket.status,
+                "status": TICKET_STATUS_LABELS[ticket.status],
                 "passengers": [
                     {
                         "id": p.id,
                         "name": p.name,
                         "age": p.age,
                         "gender": p.gender,
-                        "berth": p.berth.berth_type if p.berth else None,
-                        "rac_position": ticket.rac_position if ticket.status == TicketStatus.RAC else None,
-                        "waiting_position": ticket.waiting_position if ticket.status == TicketStatus.WAITING else None
+                        "berth": BERTH_TYPE_LABELS[p.berth.berth_type] if p.berth else None,
+                        "rac_position": ticket.rac_position if ticket.status == RAC else None,
+                        "waiting_position": ticket.waiting_position if ticket.status == WAITING else None
                     } 
-                    for p in Passenger.query.filter_by(ticket_id=ticket.id).all()
+                    for p in passengers
                 ]
             }
             
             return response_data, 201
             
+        except IntegrityError as e:
+            db.session.rollback()
+            if is_berth_contention(e):
+                raise ConcurrencyError("Seat contention, please retry") from e
+            return {"error": f"Database error: {str(e)}"}, 500
+        except StaleDataError:
+            # A row changed under us; let retry_on_concurrency run it again
+            db.session.rollback()
+            raise
         except SQLAlchemyError as e:
             db.session.rollback()
             return {"error": f"Database error: {str(e)}"}, 500
@@ -142,8 +203,11 @@ class TicketService:
             Tuple containing response data and HTTP status code
         """
         try:
-            # Start a transaction with isolation
-            db.session.begin_nested()
+            # Everything below runs in the session's single transaction, with
+            # one commit at the end (or a rollback on error)
+            
+            # Serialize with bookings and other cancellations
+            TicketService._lock_coach()
             
             # Get the ticket with FOR UPDATE lock
             ticket = Ticket.query.with_for_update().filter_by(id=ticket_id).first()
@@ -151,28 +215,34 @@ class TicketService:
             if not ticket:
                 raise ResourceNotFoundError("Ticket", ticket_id)
                 
-            if ticket.status == TicketStatus.CANCELLED:
+            if ticket.status == CANCELLED:
                 raise ValidationError("Ticket is already cancelled", field="ticket_status")
             
-            # Get all berths that need to be freed
-            berths_to_free = []
-            for passenger in ticket.passengers:
-                if passenger.berth:
-                    berths_to_free.append(passenger.berth)
-                    # Unlink passenger from berth
-                    passenger.berth.is_allocated = False
-                    passenger.berth.passenger_id = None
+            # Free the passengers' berths in one statement
+            freed_berth_ids = db.session.scalars(
+                db.update(Berth)
+                .where(Berth.passenger_id.in_(
+                    db.select(Passenger.id).where(Passenger.ticket_id == ticket.id)
+                ))
+                .values(is_allocated=False, passenger_id=None)
+                .returning(Berth.id),
+                execution_options={"synchronize_session": False}
+            ).all()
             
             # Update ticket status
             old_status = ticket.status
-            ticket.status = TicketStatus.CANCELLED
+            ticket.status = CANCELLED
             
             # If the ticket was confirmed or RAC, we need to promote others
-            if old_status in [TicketStatus.CONFIRMED, TicketStatus.RAC]:
-                TicketService._promote_tickets(berths_to_free)
+            if old_status in (CONFIRMED, RAC):
+                TicketService._promote_tickets(freed_berth_ids)
+            
+            # Close the gaps left in the RAC and waiting list queues
+            TicketService._compact_positions()
             
             # Commit the transaction
             db.session.commit()
+            _invalidate_status_cache()
             
             return {"message": f"Ticket {ticket_id} has been cancelled successfully"}, 200
             
@@ -184,61 +254,71 @@ class TicketService:
             return {"error": f"Error: {str(e)}"}, 500
     
     @staticmethod
-    def get_booked_tickets() -> Tuple[Dict, int]:
+    def iter_booked_tickets() -> Iterator[Tuple[str, Dict[str, Any]]]:
         """
-        Get all booked tickets with their details
+        Run the booked-tickets query and return an iterator over its tickets
+        
+        The query is executed before this returns, so database errors surface
+        here; the rows are then grouped into tickets lazily as the iterator is
+        consumed. Tickets come grouped by status in BOOKED_STATUSES order
+        (confirmed, RAC, waiting) and in ticket order within each group.
         
         Returns:
-            Tuple containing response data and HTTP status code
+            Iterator of (status, ticket data) pairs
         """
-        try:
-            # Get all active tickets (not cancelled)
-            tickets = Ticket.query.filter(Ticket.status != TicketStatus.CANCELLED).all()
-            
-            response_data = {
-                "confirmed": [],
-                "rac": [],
-                "waiting": [],
-                "summary": {
-                    "confirmed_count": 0,
-                    "rac_count": 0,
-                    "waiting_count": 0,
-                    "total_count": 0
-                }
-            }
-            
-            for ticket in tickets:
-                ticket_data = {
-                    "ticket_id": ticket.id,
-                    "booking_time": ticket.booking_time.isoformat(),
-                    "passengers": []
+        # Get all active tickets (not cancelled) with their passengers and
+        # berths as flat rows from a single query
+        rows = db.session.execute(
+            db.select(
+                Ticket.id, Ticket.status, Ticket.booking_time,
+                Ticket.rac_position, Ticket.waiting_position,
+                Passenger.id, Passenger.name, Passenger.age, Passenger.gender,
+                Berth.berth_type
+            )
+            .select_from(Ticket)
+            .outerjoin(Passenger, Passenger.ticket_id == Ticket.id)
+            .outerjoin(Berth, Berth.passenger_id == Passenger.id)
+            .where(Ticket.status.in_(BOOKED_STATUSES))
+            .order_by(_BOOKED_STATUS_ORDER, Ticket.id, Passenger.id)
+        )
+        
+        def tickets():
+            ticket_data = None
+            ticket_status = None
+            for (ticket_id, status, booking_time, rac_position, waiting_position,
+                 passenger_id, name, age, gender, berth_type) in rows:
+                if ticket_data is None or ticket_data["ticket_id"] != ticket_id:
+                    if ticket_data is not None:
+                        yield ticket_status, ticket_data
+                    ticket_status = status
+                    ticket_data = {
+                        "ticket_id": ticket_id,
+                        "booking_time": from_epoch_ms(booking_time),
+                        "passengers": []
+                    }
+                
+                if passenger_id is None:
+                    continue
+                
+                passenger_data = {
+                    "id": passenger_id,
+                    "name": name,
+                    "age": age,
+                    "gender": gender,
+                    "berth": BERTH_TYPE_LABELS[berth_type] if berth_type is not None else None
                 }
                 
-                for passenger in ticket.passengers:
-                    passenger_data = {
-                        "id": passenger.id,
-                        "name": passenger.name,
-                        "age": passenger.age,
-                        "gender": passenger.gender,
-                        "berth": passenger.berth.berth_type if passenger.berth else None
-                    }
+                if status == RAC:
+                    passenger_data["rac_position"] = rac_position
+                elif status == WAITING:
+                    passenger_data["waiting_position"] = waiting_position
                     
-                    if ticket.status == TicketStatus.RAC:
-                        passenger_data["rac_position"] = ticket.rac_position
-                    elif ticket.status == TicketStatus.WAITING:
-                        passenger_data["waiting_position"] = ticket.waiting_position
-                        
-                    ticket_data["passengers"].append(passenger_data)
-                
-                # Add ticket to appropriate category
-                response_data[ticket.status].append(ticket_data)
-                response_data["summary"][f"{ticket.status}_count"] += 1
-                response_data["summary"]["total_count"] += 1
-            
-            return response_data, 200
+                ticket_data["passengers"].append(passenger_data)
             
-        except Exception as e:
-            return {"error": f"Error: {str(e)}"}, 500
+            if ticket_data is not None:
+                yield ticket_status, ticket_data
+        
+        return tickets()
     
     @staticmethod
     def get_available_tickets() -> Tuple[Dict, int]:
@@ -249,6 +329,11 @@ class TicketService:
             Tuple containing response data and HTTP status code
         """
         try:
+            ttl = current_app.config.get('AVAILABILITY_CACHE_TTL', _STATUS_TTL)
+            now = time.monotonic()
+            if _status_cache['data'] is not None and now - _status_cache['ts'] < ttl:
+                return _status_cache['data'], 200
+            
             current_status = TicketService._get_current_status()
             
             response_data = {
@@ -263,78 +348,99 @@ class TicketService:
                 }
             }
             
+            _status_cache['data'] = response_data
+            _status_cache['ts'] = now
+            
             return response_data, 200
             
         except Exception as e:
             return {"error": f"Error: {str(e)}"}, 500
     
     @staticmethod
-    def _get_current_status(for_update: bool = False) -> Dict[str, Any]:
+    def _get_current_status() -> Dict[str, Any]:
         """
         Get the current status of available berths, RAC, and waiting list
         
-        Args:
-            for_update: Whether to lock rows for update (used in transactions)
+        Bookings and cancellations serialize on the coach lock (see
+        _lock_coach), so these counts are not taken with row locks.
             
         Returns:
             Dictionary with current status information
         """
-        # Count confirmed tickets
-        confirmed_query = Berth.query
-        if for_update:
-            confirmed_query = confirmed_query.with_for_update()
-            
-        confirmed_berths_used = confirmed_query.filter_by(is_allocated=True).count()
+        # Berth counts by type and allocation state, in one aggregate query
+        berth_counts = db.session.query(
+            Berth.berth_type, Berth.is_allocated, func.count()
+        ).group_by(Berth.berth_type, Berth.is_allocated).all()
         
-        # Count RAC tickets
-        rac_query = Ticket.query.filter_by(status=TicketStatus.RAC)
-        if for_update:
-            rac_query = rac_query.with_for_update()
-        rac_used = rac_query.count()
+        # RAC and waiting list ticket counts, in one aggregate query
+        ticket_counts = dict(db.session.query(Ticket.status, func.count()).filter(
+            Ticket.status.in_((RAC, WAITING))
+        ).group_by(Ticket.status).all())
         
-        # Count waiting list
-        waiting_query = Ticket.query.filter_by(status=TicketStatus.WAITING)
-        if for_update:
-            waiting_query = waiting_query.with_for_update()
-        waiting_used = waiting_query.count()
+        confirmed_berths_used = 0
+        available_by_type = {}
+        for berth_type, is_allocated, count in berth_counts:
+            if is_allocated:
+                # Side-lower berths are held by RAC passengers, not confirmed ones
+                if berth_type in CONFIRMED_BERTH_TYPES:
+                    confirmed_berths_used += count
+            else:
+                available_by_type[berth_type] = count
+        rac_used = ticket_counts.get(RAC, 0)
+        waiting_used = ticket_counts.get(WAITING, 0)
         
         # Get available berths by type
-        berth_query = Berth.query.filter_by(is_allocated=False)
-        if for_update:
-            berth_query = berth_query.with_for_update()
-        
         available_berths = {
-            "lower": berth_query.filter_by(berth_type=BerthType.LOWER).count(),
-            "middle": berth_query.filter_by(berth_type=BerthType.MIDDLE).count(),
-            "upper": berth_query.filter_by(berth_type=BerthType.UPPER).count(),
-            "side_lower": berth_query.filter_by(berth_type=BerthType.SIDE_LOWER).count()
+            "lower": available_by_type.get(LOWER, 0),
+            "middle": available_by_type.get(MIDDLE, 0),
+            "upper": available_by_type.get(UPPER, 0),
+            "side_lower": available_by_type.get(SIDE_LOWER, 0)
         }
         
         return {
-            "confirmed_available": Config.CONFIRMED_BERTHS - confirmed_berths_used,
+            "confirmed_available": max(Config.CONFIRMED_BERTHS - confirmed_berths_used, 0),
             "rac_available": Config.RAC_BERTHS - rac_used,
             "waiting_list_available": Config.WAITING_LIST_MAX - waiting_used,
             "available_berths": available_berths
         }
     
     @staticmethod
-    def _allocate_berths(ticket: Ticket, passengers: List[Passenger]) -> bool:
+    def _allocate_berths(ticket: Ticket, passengers: List[Passenger], current_status: Dict[str, Any]) -> bool:
         """
         Allocate berths to passengers based on priority and availability
         
         Args:
             ticket: The ticket object
             passengers: List of passengers who need berths
+            current_status: Availability from _get_current_status, taken
+                under the coach lock earlier in the same transaction
             
         Returns:
             True if allocation was successful
         """
-        # Get the current status
-        current_status = TicketService._get_current_status(for_update=True)
+        num_passengers = len(passengers)
+        num_priority = sum(1 for p in passengers if p.is_senior or p.is_lady_with_child)
+        
+        # Claim up to one free confirmed berth per passenger: lower berths for
+        # seniors and ladies with children first, then any free berth in id
+        # order. SKIP LOCKED hands concurrent bookings disjoint berths, and the
+        # number claimed is what can be confirmed.
+        candidate_berths = []
+        if num_priority:
+            candidate_berths = Berth.query.filter(
+                Berth.is_allocated == False,
+                Berth.berth_type == LOWER
+            ).order_by(Berth.id).with_for_update(skip_locked=True, key_share=True).limit(num_priority).all()
+        
+        remaining = num_passengers - len(candidate_berths)
+        candidate_berths += Berth.query.filter(
+            Berth.is_allocated == False,
+            Berth.berth_type.in_(CONFIRMED_BERTH_TYPES),
+            Berth.id.notin_([berth.id for berth in candidate_berths])
+        ).order_by(Berth.id).with_for_update(skip_locked=True, key_share=True).limit(remaining).all()
         
         # Check what we can allocate
-        num_passengers = len(passengers)
-        confirmed_available = current_status["confirmed_available"]
+        confirmed_available = len(candidate_berths)
         rac_available = current_status["rac_available"]
         waiting_available = current_status["waiting_list_available"]
         
@@ -342,13 +448,13 @@ class TicketService:
         # 1. Seniors (age >= 60)
         # 2. Ladies with children
         # 3. Everyone else
-        priority_passengers = sorted(
-            passengers,
-            key=lambda p: (
-                -1 if p.is_senior else (0 if p.is_lady_with_child else 1),
-                -p.age  # Secondary sort by age in descending order
-            )
+        # Secondary sort by age in descending order
+        order = priority_order(
+            [p.age for p in passengers],
+            [p.is_senior for p in passengers],
+            [p.is_lady_with_child for p in passengers]
         )
+        priority_passengers = [passengers[i] for i in order]
         
         # Determine the ticket status
         if num_passengers <= confirmed_available:
@@ -356,7 +462,7 @@ class TicketService:
             ticket.status = TicketStatus.CONFIRMED
             
             # Allocate berths with priority for lower berths
-            TicketService._allocate_confirmed_berths(ticket, priority_passengers)
+            TicketService._allocate_confirmed_berths(ticket, priority_passengers, candidate_berths)
             
         elif num_passengers <= confirmed_available + rac_available:
             # Some confirmed, some RAC
@@ -365,7 +471,7 @@ class TicketService:
             
             # Allocate confirmed berths
             if confirmed_passengers:
-                TicketService._allocate_confirmed_berths(ticket, confirmed_passengers)
+                TicketService._allocate_confirmed_berths(ticket, confirmed_passengers, candidate_berths)
             
             # Allocate RAC
             ticket.status = TicketStatus.RAC
@@ -379,7 +485,7 @@ class TicketService:
             
             # Allocate confirmed berths
             if confirmed_passengers:
-                TicketService._allocate_confirmed_berths(ticket, confirmed_passengers)
+                TicketService._allocate_confirmed_berths(ticket, confirmed_passengers, candidate_berths)
             
             # Allocate RAC
             if rac_passengers:
@@ -402,57 +508,44 @@ class TicketService:
         return True
         
     @staticmethod
-    def _allocate_confirmed_berths(ticket: Ticket, passengers: List[Passenger]) -> None:
+    def _allocate_confirmed_berths(ticket: Ticket, passengers: List[Passenger], berths: List[Berth]) -> None:
         """
         Allocate confirmed berths to passengers
         
         Args:
             ticket: The ticket object
             passengers: List of passengers who need confirmed berths
+            berths: Free berths claimed for them, at least one per passenger
         """
         # First prioritize lower berths for seniors and ladies with children
-        priority_passengers = [p for p in passengers if p.is_senior or p.is_lady_with_child]
-        regular_passengers = [p for p in passengers if not (p.is_senior or p.is_lady_with_child)]
+        priority_passengers = []
+        regular_passengers = []
+        for p in passengers:
+            if p.is_senior or p.is_lady_with_child:
+                priority_passengers.append(p)
+            else:
+                regular_passengers.append(p)
         
         # Allocate lower berths to priority passengers
-        for passenger in priority_passengers:
-            # Find an available lower berth
-            berth = Berth.query.filter_by(
-                berth_type=BerthType.LOWER, 
-                is_allocated=False
-            ).first()
-            
-            if berth:
-                # Allocate this berth
-                berth.is_allocated = True
-                berth.passenger_id = passenger.id
-                
-                # Record allocation history
-                history = BerthAllocationHistory(
-                    ticket_id=ticket.id,
-                    berth_id=berth.id
-                )
-                db.session.add(history)
-            else:
-                # No lower berths available, add to regular passengers
-                regular_passengers.append(passenger)
-        
-        # Now allocate any berth to regular passengers
-        for passenger in regular_passengers:
-            # Find any available berth
-            berth = Berth.query.filter_by(is_allocated=False).first()
-            
-            if berth:
-                # Allocate this berth
-                berth.is_allocated = True
-                berth.passenger_id = passenger.id
-                
-                # Record allocation history
-                history = BerthAllocationHistory(
-                    ticket_id=ticket.id,
-                    berth_id=berth.id
-                )
-                db.session.add(history)
+        lower_berths = [berth for berth in berths if berth.berth_type == LOWER]
+        allocations = list(zip(priority_passengers, lower_berths))  # (passenger, berth) pairs
+        # No lower berths left for the rest, add them to regular passengers
+        regular_passengers.extend(priority_passengers[len(lower_berths):])
+        
+        # Now allocate the remaining berths to regular passengers
+        taken = {berth.id for _, berth in allocations}
+        remaining_berths = [berth for berth in berths if berth.id not in taken]
+        allocations.extend(zip(regular_passengers, remaining_berths))
+        
+        for passenger, berth in allocations:
+            berth.is_allocated = True
+            berth.passenger_id = passenger.id
+        
+        # Record allocation history
+        db.session.add_all([
+            BerthAllocationHistory(ticket_id=ticket.id, berth_id=berth.id)
+            for _, berth in allocations
+        ])
     
     @staticmethod
     def _allocate_rac_berths(ticket: Ticket, passengers: List[Passenger]) -> None:
@@ -464,12 +557,9 @@ class TicketService:
             passengers: List of passengers who need RAC berths
         """
         # Find the next RAC position
-        max_rac_position = db.session.query(func.max(Ticket.rac_position)).filter(
-            Ticket.status == TicketStatus.RAC
-        ).scalar() or 0
+        rac_position = next(TicketService._positions(rac_position_seq, Ticket.rac_position, RAC))
         
         # Allocate side-lower berths for RAC passengers
-        rac_position = max_rac_position + 1
         ticket.rac_position = rac_position
         ticket.status = TicketStatus.RAC
         
@@ -478,21 +568,20 @@ class TicketService:
         side_lower_berths = Berth.query.filter_by(
             berth_type=BerthType.SIDE_LOWER, 
             is_allocated=False
-        ).all()
+        ).with_for_update(skip_locked=True, key_share=True).limit(len(passengers)).all()
         
-        for i, passenger in enumerate(passengers):
-            if i < len(side_lower_berths):
-                berth = side_lower_berths[i]
-                berth.is_allocated = True
-                berth.passenger_id = passenger.id
-                
-                # Record allocation history
-                history = BerthAllocationHistory(
-                    ticket_id=ticket.id,
-                    berth_id=berth.id,
-                    rac_position=rac_position
-                )
-                db.session.add(history)
+        history = []
+        for passenger, berth in zip(passengers, side_lower_berths):
+            berth.is_allocated = True
+            berth.passenger_id = passenger.id
+            
+            # Record allocation history
+            history.append(BerthAllocationHistory(
+                ticket_id=ticket.id,
+                berth_id=berth.id,
+                rac_position=rac_position
+            ))
+        db.session.add_all(history)
     
     @staticmethod
     def _allocate_waiting_list(ticket: Ticket, passengers: List[Passenger]) -> None:
@@ -503,99 +592,201 @@ class TicketService:
             ticket: The ticket object
             passengers: List of passengers who need waiting list positions
         """
-        # Find the next waiting list position
-        max_waiting_position = db.session.query(func.max(Ticket.waiting_position)).filter(
-            Ticket.status == TicketStatus.WAITING
-        ).scalar() or 0
-        
-        # Assign waiting list position
-        waiting_position = max_waiting_position + 1
+        # Assign the next waiting list position
+        waiting_position = next(TicketService._positions(waiting_position_seq, Ticket.waiting_position, WAITING))
         ticket.waiting_position = waiting_position
         ticket.status = TicketStatus.WAITING
         
         # Record history for all passengers in this waiting list
-        for passenger in passengers:
-            history = BerthAllocationHistory(
+        db.session.add_all([
+            BerthAllocationHistory(
                 ticket_id=ticket.id,
                 berth_id=None,  # No berth allocated yet
                 waiting_position=waiting_position
             )
-            db.session.add(history)
+            for _ in passengers
+        ])
     
     @staticmethod
-    def _promote_tickets(freed_berths: List[Berth]) -> None:
+    def _positions(sequence: db.Sequence, column, status: int) -> Iterator[int]:
         """
-        Promote tickets from RAC to confirmed and waiting list to RAC
+        Yield successive RAC or waiting list positions
+        
+        Positions come from the database sequence where there is one. SQLite
+        has no sequences, so there they continue from the highest position
+        held by a ticket in the given status.
         
         Args:
-            freed_berths: List of berths that were freed by cancellation
+            sequence: Sequence the positions are drawn from
+            column: Ticket position column
+            status: Ticket status the positions belong to
         """
-        if not freed_berths:
-            return
-            
-        # First, get all RAC tickets ordered by booking time (oldest first)
-        rac_tickets = Ticket.query.filter_by(status=TicketStatus.RAC).order_by(Ticket.booking_time).all()
+        if db.session.get_bind().dialect.supports_sequences:
+            while True:
+                yield db.session.scalar(sequence.next_value())
+        else:
+            last_position = db.session.query(func.max(column)).filter(
+                Ticket.status == status
+            ).scalar() or 0
+            yield from itertools.count(last_position + 1)
+    
+    @staticmethod
+    def _compact_positions() -> None:
+        """
+        Renumber RAC and waiting list positions as 1..n in booking order
         
-        if not rac_tickets:
-            return  # No RAC tickets to promote
+        Sequences only ever move forward, so after a cancellation the
+        positions are rewritten with row_number() and the sequence is reset to
+        continue from the last one.
+        """
+        for sequence, column, status in (
+            (rac_position_seq, Ticket.rac_position, RAC),
+            (waiting_position_seq, Ticket.waiting_position, WAITING)
+        ):
+            ranked = db.select(
+                Ticket.id,
+                func.row_number().over(order_by=(Ticket.booking_time, Ticket.id)).label('position')
+            ).filter(Ticket.status == status).subquery()
+            
+            result = db.session.execute(
+                db.update(Ticket)
+                .where(Ticket.id == ranked.c.id)
+                .values({column: ranked.c.position}),
+                execution_options={"synchronize_session": False}
+            )
             
-        # For each freed berth, promote a passenger from RAC
-        for berth in freed_berths:
-            if not rac_tickets:
-                break  # No more RAC tickets to promote
-                
-            # Get the oldest RAC ticket
-            rac_ticket = rac_tickets[0]
-            
-            # Find a passenger to promote (one that doesn't have a confirmed berth)
-            passenger = None
-            for p in rac_ticket.passengers:
-                if p.age >= Config.MIN_AGE_FOR_BERTH and (not p.berth or p.berth.berth_type == BerthType.SIDE_LOWER):
-                    passenger = p
-                    break
-                    
-            if not passenger:
-                # All passengers already have confirmed berths or are children, try next ticket
-                rac_tickets.pop(0)
-                continue
-                
-            # Update the berth allocation
-            if passenger.berth:
-                # Free the old RAC berth
-                old_berth = passenger.berth
-                old_berth.is_allocated = False
-                old_berth.passenger_id = None
-            
-            # Allocate the new confirmed berth
-            berth.is_allocated = True
-            berth.passenger_id = passenger.id
+            if db.session.get_bind().dialect.supports_sequences:
+                # setval(seq, 1, false) makes the next value 1 again
+                last_position = result.rowcount
+                db.session.execute(
+                    text("SELECT setval(:name, :value, :called)"),
+                    {"name": sequence.name, "value": max(last_position, 1), "called": last_position > 0}
+                )
+    
+    @staticmethod
+    def _promote_rac_passengers(freed_berth_ids: List[int]) -> List[int]:
+        """
+        Move RAC passengers onto freed confirmed berths with set-based SQL
+        
+        The oldest RAC tickets go first, and within a ticket its passengers
+        in the order they were booked. A promoted passenger's side-lower berth
+        is released, and tickets whose passengers all hold confirmed berths
+        become confirmed.
+        
+        Args:
+            freed_berth_ids: IDs of the freed berths; only lower, middle and
+                upper berths are handed out here
             
-            # Record the allocation
-            history = BerthAllocationHistory(
-                ticket_id=rac_ticket.id,
-                berth_id=berth.id
+        Returns:
+            IDs of the promoted passengers
+        """
+        if not freed_berth_ids:
+            return []
+        
+        # Berth-eligible passengers of a ticket who hold no confirmed berth
+        def without_confirmed_berth(passenger_id):
+            return ~db.select(Berth.id).where(
+                Berth.passenger_id == passenger_id,
+                Berth.berth_type.in_(CONFIRMED_BERTH_TYPES)
+            ).exists()
+        
+        waiting_passengers = db.select(
+            Passenger.id.label('passenger_id'),
+            func.row_number().over(
+                order_by=(Ticket.booking_time, Ticket.id, Passenger.id)
+            ).label('rn')
+        ).join(Ticket, Ticket.id == Passenger.ticket_id).where(
+            Ticket.status == RAC,
+            Passenger.age >= Config.MIN_AGE_FOR_BERTH,
+            without_confirmed_berth(Passenger.id)
+        ).subquery()
+        
+        free_berths = db.select(
+            Berth.id.label('berth_id'),
+            func.row_number().over(order_by=Berth.id).label('rn')
+        ).where(
+            Berth.id.in_(freed_berth_ids),
+            Berth.berth_type.in_(CONFIRMED_BERTH_TYPES)
+        ).subquery()
+        
+        pairs = db.select(free_berths.c.berth_id, waiting_passengers.c.passenger_id).join(
+            waiting_passengers, waiting_passengers.c.rn == free_berths.c.rn
+        ).subquery()
+        
+        # Release the side-lower berths of the passengers about to be promoted
+        # first, so no passenger ever holds two berths
+        db.session.execute(
+            db.update(Berth)
+            .where(
+                Berth.berth_type == SIDE_LOWER,
+                Berth.passenger_id.in_(db.select(pairs.c.passenger_id))
+            )
+            .values(is_allocated=False, passenger_id=None),
+            execution_options={"synchronize_session": False}
+        )
+        
+        # Hand out the freed berths
+        promoted = db.session.execute(
+            db.update(Berth)
+            .where(Berth.id == pairs.c.berth_id)
+            .values(is_allocated=True, passenger_id=pairs.c.passenger_id)
+            .returning(Berth.id, Berth.passenger_id),
+            execution_options={"synchronize_session": False}
+        ).all()
+        if not promoted:
+            return []
+        
+        berth_ids = [berth_id for berth_id, _ in promoted]
+        passenger_ids = [passenger_id for _, passenger_id in promoted]
+        
+        # Record the allocations
+        db.session.execute(
+            db.insert(BerthAllocationHistory).from_select(
+                ['ticket_id', 'berth_id'],
+                db.select(Passenger.ticket_id, Berth.id)
+                .join(Berth, Berth.passenger_id == Passenger.id)
+                .where(Berth.id.in_(berth_ids))
+            )
+        )
+        
+        # Confirm the tickets that no longer have anyone on RAC
+        still_on_rac = db.select(Passenger.id).where(
+            Passenger.ticket_id == Ticket.id,
+            Passenger.age >= Config.MIN_AGE_FOR_BERTH,
+            without_confirmed_berth(Passenger.id)
+        ).exists()
+        db.session.execute(
+            db.update(Ticket)
+            .where(
+                Ticket.status == RAC,
+                Ticket.id.in_(db.select(Passenger.ticket_id).where(Passenger.id.in_(passenger_ids))),
+                ~still_on_rac
             )
-            db.session.add(history)
-            
-            # Update passenger's berth reference directly
-            passenger.berth = berth
-            
-            # Check if all passengers in this ticket now have confirmed berths
-            # A passenger has a confirmed berth if they have a berth and it's not a side-lower berth
-            all_confirmed = True
-            for p in rac_ticket.passengers:
-                if p.age >= Config.MIN_AGE_FOR_BERTH:
-                    has_confirmed_berth = p.berth and p.berth.berth_type in [BerthType.LOWER, BerthType.MIDDLE, BerthType.UPPER]
-                    if not has_confirmed_berth:
-                        all_confirmed = False
-                        break
-            
-            if all_confirmed:
-                # Update ticket status to confirmed
-                rac_ticket.status = TicketStatus.CONFIRMED
-                rac_ticket.rac_position = None
-                # Remove this ticket from our list
-                rac_tickets.pop(0)
+            .values(status=CONFIRMED, rac_position=None),
+            execution_options={"synchronize_session": False}
+        )
+        
+        return passenger_ids
+    
+    @staticmethod
+    def _promote_tickets(freed_berth_ids: List[int]) -> None:
+        """
+        Promote tickets from RAC to confirmed and waiting list to RAC
+        
+        Args:
+            freed_berth_ids: IDs of the berths that were freed by cancellation
+        """
+        if not freed_berth_ids:
+            return
+        
+        # Write out the cancellation first; the statements below work on the
+        # tables directly
+        db.session.flush()
+        
+        TicketService._promote_rac_passengers(freed_berth_ids)
+        
+        # Objects already in the session may hold the old berth assignments
+        db.session.expire_all()
         
         # Now promote waiting list tickets to RAC if there are any RAC positions available
         # Count how many RAC spots are available
@@ -603,46 +794,51 @@ class TicketService:
         rac_available = Config.RAC_BERTHS - rac_used
         
         if rac_available > 0:
-            # Find waiting list tickets to promote (oldest first)
-            waiting_tickets = Ticket.query.filter_by(
+            # Find waiting list tickets to promote (oldest first), and the free
+            # side-lower berths they can take
+            waiting_tickets = Ticket.query.options(
+                joinedload(Ticket.passengers)
+            ).filter_by(
                 status=TicketStatus.WAITING
-            ).order_by(Ticket.booking_time).limit(rac_available).all()
+            ).order_by(Ticket.booking_time, Ticket.id).limit(rac_available).all()
             
+            free_side_lowers = Berth.query.filter_by(
+                berth_type=BerthType.SIDE_LOWER, 
+                is_allocated=False
+            ).order_by(Berth.id).with_for_update(
+                skip_locked=True, key_share=True
+            ).limit(len(waiting_tickets)).all()
+            
+            history = []
+            min_age = Config.MIN_AGE_FOR_BERTH
+            rac_positions = TicketService._positions(rac_position_seq, Ticket.rac_position, RAC)
             for waiting_ticket in waiting_tickets:
-                # Find the next RAC position
-                max_rac_position = db.session.query(func.max(Ticket.rac_position)).filter(
-                    Ticket.status == TicketStatus.RAC
-                ).scalar() or 0
-                
-                new_rac_position = max_rac_position + 1
+                new_rac_position = next(rac_positions)
                 
                 # Promote to RAC
                 waiting_ticket.status = TicketStatus.RAC
                 waiting_ticket.rac_position = new_rac_position
                 waiting_ticket.waiting_position = None
                 
-                # Allocate side-lower berths if available
-                side_lower_berth = Berth.query.filter_by(
-                    berth_type=BerthType.SIDE_LOWER, 
-                    is_allocated=False
-                ).first()
-                
-                if side_lower_berth:
+                # Allocate a side-lower berth if available
+                if free_side_lowers:
                     # Find a passenger to assign this berth to
-                    passenger = Passenger.query.filter(
-                        Passenger.ticket_id == waiting_ticket.id,
-                        Passenger.age >= Config.MIN_AGE_FOR_BERTH
-                    ).first()
+                    passenger = min(
+                        (p for p in waiting_ticket.passengers if p.age >= min_age),
+                        key=lambda p: p.id,
+                        default=None
+                    )
                     
                     if passenger:
+                        side_lower_berth = free_side_lowers.pop(0)
                         side_lower_berth.is_allocated = True
                         side_lower_berth.passenger_id = passenger.id
                         passenger.berth = side_lower_berth  # Update passenger's berth reference directly
                         
                         # Record allocation
-                        history = BerthAllocationHistory(
+                        history.append(BerthAllocationHistory(
                             ticket_id=waiting_ticket.id,
                             berth_id=side_lower_berth.id,
                             rac_position=new_rac_position
-                        )
-                        db.session.add(history)
+                        ))
+            db.session.add_all(history)
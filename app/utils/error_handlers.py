@@ -1,6 +1,9 @@
 """
 Error handling utilities for the application
 """
+import functools
+
+import orjson
 from flask import jsonify, current_app
 from werkzeug.exceptions import HTTPException
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError, OperationalError
@@ -13,10 +16,13 @@ class TicketSystemError(Exception):
         self.status_code = status_code
         super().__init__(self.message)
 
+# Message for ResourceNotFoundError, filled with the resource type and ID
+_NOT_FOUND_TEMPLATE = "%s with ID %s not found"
+
 class ResourceNotFoundError(TicketSystemError):
     """Exception raised when a requested resource is not found"""
     def __init__(self, resource_type, resource_id):
-        message = f"{resource_type} with ID {resource_id} not found"
+        message = _NOT_FOUND_TEMPLATE % (resource_type, resource_id)
         super().__init__(message, code="RESOURCE_NOT_FOUND", status_code=404)
 
 class NoAvailabilityError(TicketSystemError):
@@ -43,19 +49,71 @@ class DatabaseError(TicketSystemError):
             message = f"{message}: {str(original_exception)}"
         super().__init__(message, code="DATABASE_ERROR", status_code=500)
 
+# Unique constraint that keeps a passenger on at most one berth; violating it
+# means two transactions raced for the same allocation
+BERTH_PASSENGER_CONSTRAINT = 'uq_berth_passenger'
+
+def is_berth_contention(error):
+    """Whether an IntegrityError comes from the berth allocation constraint"""
+    # Postgres reports the constraint name, SQLite only the columns
+    message = str(getattr(error, 'orig', error))
+    return BERTH_PASSENGER_CONSTRAINT in message or 'berths.passenger_id' in message
+
+# User-facing message and code for each kind of database error; subclasses
+# are resolved through their MRO, anything else is a generic database error
+_DB_ERROR_MAP = {
+    IntegrityError: ("Data integrity error occurred", "INTEGRITY_ERROR"),
+    OperationalError: ("Database operation error occurred", "OPERATIONAL_ERROR"),
+}
+_DB_ERROR_DEFAULT = ("A database error occurred", "DATABASE_ERROR")
+
+@functools.lru_cache(maxsize=None)
+def _db_error_info(error_class):
+    """Message and code for a SQLAlchemy exception class"""
+    for cls in error_class.__mro__:
+        info = _DB_ERROR_MAP.get(cls)
+        if info:
+            return info
+    return _DB_ERROR_DEFAULT
+
+# Errors whose messages embed a resource ID or database detail; caching
+# their bodies would only fill the cache with one-off entries
+_UNCACHED_ERRORS = (ResourceNotFoundError, DatabaseError)
+
+def _encode_error_body(message, code):
+    """Encoded JSON body for a ticket system error"""
+    body = {'error': message}
+    if code:
+        body['code'] = code
+    return orjson.dumps(body) + b"\n"
+
+@functools.lru_cache(maxsize=256)
+def _error_body(message, code):
+    """
+    Encoded JSON body for a ticket system error with a fixed message
+    
+    Most errors repeat the same few messages (validation failures, no
+    availability), so their bodies are encoded once and reused.
+    """
+    return _encode_error_body(message, code)
+
 def register_error_handlers(app):
     """Register error handlers with the Flask application"""
+    # Fixed for the lifetime of the app, so read once here
+    debug_mode = bool(app.config.get('DEBUG', False))
     
     @app.errorhandler(TicketSystemError)
     def handle_ticket_system_error(error):
         """Handle custom ticket system errors"""
-        response = {
-            'error': error.message
-        }
-        if error.code:
-            response['code'] = error.code
-            
-        return jsonify(response), error.status_code
+        if isinstance(error, _UNCACHED_ERRORS):
+            body = _encode_error_body(error.message, error.code)
+        else:
+            body = _error_body(error.message, error.code)
+        return app.response_class(
+            body,
+            status=error.status_code,
+            mimetype='application/json'
+        )
     
     @app.errorhandler(HTTPException)
     def handle_http_exception(error):
@@ -69,20 +127,20 @@ def register_error_handlers(app):
     @app.errorhandler(SQLAlchemyError)
     def handle_sqlalchemy_error(error):
         """Handle SQLAlchemy errors"""
-        # Log the full error for debugging
-        current_app.logger.error(f"Database error: {str(error)}")
+        # Log the full error for debugging; rendering it (statement and
+        # parameters) is left to the logger, so it only happens if emitted
+        current_app.logger.error("Database error: %s", error)
+        
+        if isinstance(error, IntegrityError) and is_berth_contention(error):
+            # Lost a race for a berth; the client can simply retry
+            return jsonify({
+                'error': "Seat contention, please retry",
+                'code': "CONCURRENCY_ERROR"
+            }), 409
         
         # Provide appropriate user-facing message based on error type
-        if isinstance(error, IntegrityError):
-            message = "Data integrity error occurred"
-            code = "INTEGRITY_ERROR"
-        elif isinstance(error, OperationalError):
-            message = "Database operation error occurred"
-            code = "OPERATIONAL_ERROR"
-        else:
-            message = "A database error occurred"
-            code = "DATABASE_ERROR"
-            
+        message, code = _db_error_info(type(error))
+        
         return jsonify({
             'error': message,
             'code': code
@@ -95,7 +153,7 @@ def register_error_handlers(app):
         current_app.logger.exception("Unhandled exception occurred")
         
         # In production, don't expose error details
-        if app.config.get('DEBUG', False):
+        if debug_mode:
             message = str(error)
         else:
             message = "An unexpected error occurred"
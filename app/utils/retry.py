@@ -0,0 +1,32 @@
+"""
+Retrying units of work that lost a race with a concurrent transaction
+"""
+import functools
+
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.db import db
+from app.utils.error_handlers import ConcurrencyError
+
+def retry_on_concurrency(max_attempts=3):
+    """
+    Re-run the decorated unit of work when it fails on concurrent access
+    
+    The function must do its own commit, so a failed attempt leaves nothing
+    behind once the session is rolled back. After max_attempts the last
+    ConcurrencyError propagates (a 409 for the client).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(1, max_attempts + 1):
+                try:
+                    return func(*args, **kwargs)
+                except (ConcurrencyError, StaleDataError) as e:
+                    db.session.rollback()
+                    if attempt == max_attempts:
+                        if isinstance(e, ConcurrencyError):
+                            raise
+                        raise ConcurrencyError() from e
+        return wrapper
+    return decorator
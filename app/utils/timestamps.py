@@ -0,0 +1,15 @@
+"""
+Epoch-millisecond timestamps stored in integer columns
+"""
+import time
+from datetime import datetime, timezone
+
+def epoch_ms():
+    """Current time as integer milliseconds since the Unix epoch"""
+    return int(time.time() * 1000)
+
+def from_epoch_ms(value):
+    """Convert epoch milliseconds to a naive UTC datetime"""
+    if value is None:
+        return None
+    return datetime.fromtimestamp(value / 1000, timezone.utc).replace(tzinfo=None)
@@ -0,0 +1,49 @@
+"""add the free berth index and one berth per passenger constraint
+
+Revision ID: 3f9e598db21c
+Revises: c68252a032fe
+Create Date: 2026-10-15 22:45:54.428867
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9e598db21c'
+down_revision = 'c68252a032fe'
+branch_labels = None
+depends_on = None
+
+# Partial index over free berths; its predicate compares berth_type with the
+# integer codes, so it comes after the type conversion revision
+FREE_BERTH_INDEX = 'ix_berth_free'
+PASSENGER_CONSTRAINT = 'uq_berth_passenger'
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    
+    # SQLite can't add a constraint in place; batch mode rebuilds the table,
+    # so this runs before the partial index is created
+    if PASSENGER_CONSTRAINT not in {c['name'] for c in inspector.get_unique_constraints('berths')}:
+        with op.batch_alter_table('berths') as batch_op:
+            batch_op.create_unique_constraint(PASSENGER_CONSTRAINT, ['passenger_id'])
+    
+    if FREE_BERTH_INDEX not in {index['name'] for index in inspector.get_indexes('berths')}:
+        op.create_index(
+            FREE_BERTH_INDEX, 'berths', ['berth_type', 'id'],
+            postgresql_where=sa.text('is_allocated = false'),
+            sqlite_where=sa.text('is_allocated = 0')
+        )
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    
+    if FREE_BERTH_INDEX in {index['name'] for index in inspector.get_indexes('berths')}:
+        op.drop_index(FREE_BERTH_INDEX, table_name='berths')
+    
+    if PASSENGER_CONSTRAINT in {c['name'] for c in inspector.get_unique_constraints('berths')}:
+        with op.batch_alter_table('berths') as batch_op:
+            batch_op.drop_constraint(PASSENGER_CONSTRAINT, type_='unique')
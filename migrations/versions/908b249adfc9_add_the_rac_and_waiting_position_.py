@@ -0,0 +1,49 @@
+"""add the rac and waiting position sequences
+
+Revision ID: 908b249adfc9
+Revises: f9e9bce3258c
+Create Date: 2026-10-15 22:47:31.685820
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '908b249adfc9'
+down_revision = 'f9e9bce3258c'
+branch_labels = None
+depends_on = None
+
+# (sequence, position column, status code) of the RAC and waiting list
+SEQUENCES = (
+    ('rac_position_seq', 'rac_position', 2),
+    ('waiting_position_seq', 'waiting_position', 3),
+)
+
+
+def upgrade():
+    bind = op.get_bind()
+    if not bind.dialect.supports_sequences:
+        # SQLite numbers positions from the current maximum instead
+        return
+    
+    for name, column, status in SEQUENCES:
+        op.execute(sa.schema.CreateSequence(sa.Sequence(name), if_not_exists=True))
+        # Continue from the highest position already held, as
+        # TicketService._compact_positions leaves it
+        last_position = bind.scalar(sa.text(
+            f"SELECT COALESCE(MAX({column}), 0) FROM tickets WHERE status = :status"
+        ), {"status": status})
+        bind.execute(
+            sa.text("SELECT setval(:name, :value, :called)"),
+            {"name": name, "value": max(last_position, 1), "called": last_position > 0}
+        )
+
+
+def downgrade():
+    if not op.get_bind().dialect.supports_sequences:
+        return
+    
+    for name, _, _ in SEQUENCES:
+        op.execute(sa.schema.DropSequence(sa.Sequence(name), if_exists=True))
@@ -0,0 +1,66 @@
+"""store ticket status and berth type as small integer codes
+
+Revision ID: a74d5b52d760
+Revises: 
+Create Date: 2026-10-15 22:44:59.488010
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a74d5b52d760'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Stored label -> code, as of this revision (TicketStatus and BerthType in
+# app/config.py); frozen here so later changes to the enums don't alter it
+TICKET_STATUS_CODES = {'confirmed': 1, 'rac': 2, 'waiting': 3, 'cancelled': 4}
+BERTH_TYPE_CODES = {'lower': 1, 'middle': 2, 'upper': 3, 'side-lower': 4}
+
+CONVERSIONS = (
+    ('tickets', 'status', TICKET_STATUS_CODES),
+    ('berths', 'berth_type', BERTH_TYPE_CODES),
+)
+
+
+def _case(column, mapping):
+    """CASE expression translating column through mapping"""
+    whens = ' '.join(f"WHEN {source!r} THEN {target!r}" for source, target in mapping.items())
+    return f"CASE {column} {whens} END"
+
+
+def _is_integer(table, column):
+    """Whether the column already holds codes (a database made by create_all)"""
+    columns = sa.inspect(op.get_bind()).get_columns(table)
+    return isinstance(next(c['type'] for c in columns if c['name'] == column), sa.Integer)
+
+
+def _convert(table, column, mapping, type_, existing_type):
+    if op.get_bind().dialect.name == 'postgresql':
+        op.alter_column(
+            table, column,
+            type_=type_, existing_type=existing_type, existing_nullable=False,
+            postgresql_using=_case(column, mapping)
+        )
+    else:
+        # SQLite: rewrite the values in place, then rebuild the table with
+        # the new column type
+        op.execute(f"UPDATE {table} SET {column} = {_case(column, mapping)}")
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(column, type_=type_, existing_type=existing_type, existing_nullable=False)
+
+
+def upgrade():
+    for table, column, codes in CONVERSIONS:
+        if not _is_integer(table, column):
+            _convert(table, column, codes, sa.SmallInteger(), sa.String(length=20))
+
+
+def downgrade():
+    for table, column, codes in CONVERSIONS:
+        if _is_integer(table, column):
+            labels = {code: label for label, code in codes.items()}
+            _convert(table, column, labels, sa.String(length=20), sa.SmallInteger())
@@ -0,0 +1,44 @@
+"""index ticket, passenger and allocation history lookups
+
+Revision ID: c68252a032fe
+Revises: a74d5b52d760
+Create Date: 2026-10-15 22:45:30.747065
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c68252a032fe'
+down_revision = 'a74d5b52d760'
+branch_labels = None
+depends_on = None
+
+# (name, table, columns) of the plain indexes declared on the models
+INDEXES = (
+    ('ix_ticket_status_time', 'tickets', ['status', 'booking_time']),
+    ('ix_tickets_rac_position', 'tickets', ['rac_position']),
+    ('ix_tickets_waiting_position', 'tickets', ['waiting_position']),
+    ('ix_passenger_ticket_age', 'passengers', ['ticket_id', 'age']),
+    ('ix_berths_is_allocated', 'berths', ['is_allocated']),
+    ('ix_berth_allocation_history_ticket_id', 'berth_allocation_history', ['ticket_id']),
+    ('ix_berth_allocation_history_berth_id', 'berth_allocation_history', ['berth_id']),
+)
+
+
+def _index_names(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    # Databases built by create_all at this version already have them
+    for name, table, columns in INDEXES:
+        if name not in _index_names(table):
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        if name in _index_names(table):
+            op.drop_index(name, table_name=table)
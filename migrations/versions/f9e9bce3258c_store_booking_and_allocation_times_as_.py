@@ -0,0 +1,78 @@
+"""store booking and allocation times as epoch milliseconds
+
+Revision ID: f9e9bce3258c
+Revises: 3f9e598db21c
+Create Date: 2026-10-15 22:46:19.417869
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f9e9bce3258c'
+down_revision = '3f9e598db21c'
+branch_labels = None
+depends_on = None
+
+# (table, column, index) of the timestamp columns; the old values are naive
+# UTC datetimes, the new ones integer milliseconds since the Unix epoch
+TIMESTAMPS = (
+    ('tickets', 'booking_time', 'ix_tickets_booking_time'),
+    ('berth_allocation_history', 'created_at', 'ix_berth_allocation_history_created_at'),
+)
+
+TO_EPOCH_MS = {
+    'postgresql': "(EXTRACT(EPOCH FROM {column}) * 1000)::bigint",
+    'sqlite': "CAST(ROUND((julianday({column}) - 2440587.5) * 86400000) AS INTEGER)",
+}
+FROM_EPOCH_MS = {
+    'postgresql': "to_timestamp({column} / 1000.0) AT TIME ZONE 'UTC'",
+    'sqlite': "strftime('%Y-%m-%d %H:%M:%f', {column} / 1000.0, 'unixepoch')",
+}
+
+
+def _is_integer(table, column):
+    """Whether the column already holds epoch milliseconds (a database made by create_all)"""
+    columns = sa.inspect(op.get_bind()).get_columns(table)
+    return isinstance(next(c['type'] for c in columns if c['name'] == column), sa.Integer)
+
+
+def _convert(table, column, expression, type_, existing_type):
+    dialect = op.get_bind().dialect.name
+    expression = expression[dialect].format(column=column)
+    if dialect == 'postgresql':
+        op.alter_column(
+            table, column,
+            type_=type_, existing_type=existing_type, nullable=False,
+            postgresql_using=expression
+        )
+    else:
+        # SQLite: the batch rebuild CASTs the copied values to the new type,
+        # which would truncate a datetime string to its year, so rewrite the
+        # values while they sit in an integer-typed column
+        if isinstance(type_, sa.Integer):
+            op.execute(f"UPDATE {table} SET {column} = {expression}")
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(column, type_=type_, existing_type=existing_type, nullable=False)
+        if not isinstance(type_, sa.Integer):
+            op.execute(f"UPDATE {table} SET {column} = {expression}")
+
+
+def upgrade():
+    # created_at used to be nullable; give any missing value the migration time
+    op.execute("UPDATE berth_allocation_history SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL")
+
+    for table, column, index in TIMESTAMPS:
+        if not _is_integer(table, column):
+            _convert(table, column, TO_EPOCH_MS, sa.BigInteger(), sa.DateTime())
+        if index not in {i['name'] for i in sa.inspect(op.get_bind()).get_indexes(table)}:
+            op.create_index(index, table, [column])
+
+
+def downgrade():
+    for table, column, index in TIMESTAMPS:
+        if index in {i['name'] for i in sa.inspect(op.get_bind()).get_indexes(table)}:
+            op.drop_index(index, table_name=table)
+        if _is_integer(table, column):
+            _convert(table, column, FROM_EPOCH_MS, sa.DateTime(), sa.BigInteger())
@@ -10,31 +10,26 @@ app = create_app()
 def setup_berths():
     """Initialize berths in the database if they don't exist"""
     with app.app_context():
-        # Check if berths are already created
-        berth_count = Berth.query.count()
-        if berth_count == 0:
+        # Check if berths are already created; stops at the first row
+        if db.session.query(Berth.id).first() is None:
             print("Initializing berths...")
             
-            # Create confirmed berths (63 total)
-            # Distribution: 21 lower, 21 middle, 21 upper
-            for i in range(1, 22):  # 21 of each type
-                # Lower berth
-                db.session.add(Berth(berth_type=BerthType.LOWER))
-                
-                # Middle berth
-                db.session.add(Berth(berth_type=BerthType.MIDDLE))
-                
-                # Upper berth
-                db.session.add(Berth(berth_type=BerthType.UPPER))
-            
-            # Create 9 side-lower berths for RAC (18 passengers, 2 per berth)
-            for i in range(1, 10):
-                db.session.add(Berth(berth_type=BerthType.SIDE_LOWER))
+            # Confirmed berths: 21 each of lower, middle and upper (63 total),
+            # then 9 side-lower berths for RAC (18 passengers, 2 per berth)
+            berth_types = (
+                [BerthType.LOWER, BerthType.MIDDLE, BerthType.UPPER] * 21
+                + [BerthType.SIDE_LOWER] * 9
+            )
             
+            # One multi-row INSERT instead of a unit-of-work flush per berth
+            db.session.execute(
+                Berth.__table__.insert(),
+                [{'berth_type': berth_type} for berth_type in berth_types]
+            )
             db.session.commit()
-            print(f"Created {Berth.query.count()} berths")
+            print(f"Created {len(berth_types)} berths")
         else:
-            print(f"Berths already exist: {berth_count} berths found")
+            print("Berths already exist, skipping initialization")
 
 if __name__ == '__main__':
     setup_berths()
@@ -49,5 +44,7 @@ if __name__ == '__main__':
         print("In production mode, please run with Gunicorn:")
         print(f"gunicorn --bind 0.0.0.0:{port} --workers 4 'run:app'")
     else:
-        # In development, use Flask's built-in server
-        app.run(host='0.0.0.0', port=port, debug=True)
+        # In development, use Flask's built-in server, one thread per request
+        # so concurrent test clients aren't serialized (use the Gunicorn
+        # command above for real load)
+        app.run(host='0.0.0.0', port=port, debug=True, threaded=True)
@@ -11,22 +11,17 @@ with app.app_context():
     db.create_all()
     
     # Initialize berths
-    # Create confirmed berths (63 total)
-    # Distribution: 21 lower, 21 middle, 21 upper
-    for i in range(1, 22):  # 21 of each type
-        # Lower berth
-        db.session.add(Berth(berth_type=BerthType.LOWER))
-        
-        # Middle berth
-        db.session.add(Berth(berth_type=BerthType.MIDDLE))
-        
-        # Upper berth
-        db.session.add(Berth(berth_type=BerthType.UPPER))
+    # Confirmed berths: 21 each of lower, middle and upper (63 total),
+    # then 9 side-lower berths for RAC (18 passengers, 2 per berth)
+    berth_types = (
+        [BerthType.LOWER, BerthType.MIDDLE, BerthType.UPPER] * 21
+        + [BerthType.SIDE_LOWER] * 9
+    )
     
-    # Create 9 side-lower berths for RAC (18 passengers, 2 per berth)
-    for i in range(1, 10):
-        db.session.add(Berth(berth_type=BerthType.SIDE_LOWER))
-    
-    # Commit the changes
-    db.session.commit()
+    # One multi-row INSERT in a single transaction, committed when the block exits
+    with db.session.begin():
+        db.session.execute(
+            Berth.__table__.insert(),
+            [{'berth_type': berth_type} for berth_type in berth_types]
+        )
     print("Database tables created successfully")
@@ -5,6 +5,7 @@ This script tests all the API endpoints and verifies their functionality
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import time
 import sys
@@ -14,71 +15,98 @@ import os
 # Set API base URL
 BASE_URL = "http://localhost:5001/api/v1"
 SERVER_URL = "http://localhost:5001"
+HEALTH_URL = f"{BASE_URL}/tickets/health"
+
+# Pretty-print request and response bodies only when TEST_VERBOSE is set
+VERBOSE = bool(os.environ.get("TEST_VERBOSE"))
+
+# One keep-alive session for every request instead of a new connection each time
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=0))
+
+# Delays (seconds) between readiness checks after starting the server; ~10s in total
+SERVER_START_BACKOFF = (0.25, 0.25, 0.5, 0.5, 1, 1, 1, 1, 2, 2)
+
+# ANSI color codes used by print_colored
+_COLORS = {
+    'green': '\033[0;32m',
+    'red': '\033[0;31m',
+    'yellow': '\033[0;33m',
+    'blue': '\033[0;34m',
+    'nc': '\033[0m'  # No Color
+}
+_NC = _COLORS['nc']
 
 def print_colored(text, color):
     """Print colored text to the console"""
-    colors = {
-        'green': '\033[0;32m',
-        'red': '\033[0;31m',
-        'yellow': '\033[0;33m',
-        'blue': '\033[0;34m',
-        'nc': '\033[0m'  # No Color
-    }
-    print(f"{colors.get(color, colors['nc'])}{text}{colors['nc']}")
+    print(f"{_COLORS.get(color, _NC)}{text}{_NC}")
+
+def server_ready(timeout):
+    """Probe the health endpoint with a body-less HEAD request"""
+    try:
+        response = SESSION.head(HEALTH_URL, timeout=timeout, allow_redirects=False)
+    except requests.RequestException:
+        return False
+    # Anything short of a server error means the app is up; the health check
+    # itself answers 500 while the database is unreachable
+    return response.status_code < 500
 
 def check_server():
     """Check if the server is running and start it if needed"""
     print_colored("Checking if the server is running...", "yellow")
-    try:
-        response = requests.get(SERVER_URL, timeout=5)
-        if response.status_code == 200:
-            print_colored("Server is running.", "green")
-            return True
-    except requests.RequestException:
-        pass
+    if server_ready(timeout=5):
+        print_colored("Server is running.", "green")
+        return True
     
     print_colored("Server is not running. Starting the server...", "red")
     try:
-        # Try to start the server using docker-compose
-        subprocess.run(["docker-compose", "up", "-d"], check=True)
-        print("Waiting for server to start...")
-        time.sleep(10)
-        
-        # Check if server is now running
-        try:
-            response = requests.get(SERVER_URL, timeout=5)
-            if response.status_code == 200:
-                print_colored("Server started successfully.", "green")
-                return True
-        except requests.RequestException:
-            pass
-        
-        print_colored("Failed to start the server. Please start it manually.", "red")
-        return False
-    except subprocess.SubprocessError as e:
+        # Try to start the server using docker-compose, without waiting for it:
+        # the readiness poll below runs while the containers come up
+        proc = subprocess.Popen(["docker-compose", "up", "-d"], stdout=subprocess.DEVNULL)
+    except (OSError, subprocess.SubprocessError) as e:
         print_colored(f"Error starting server: {e}", "red")
         return False
+    print("Waiting for server to start...")
+    
+    # Poll with backoff so a fast start isn't held to the worst-case wait
+    for delay in SERVER_START_BACKOFF:
+        time.sleep(delay)
+        if server_ready(timeout=0.5):
+            print_colored("Server started successfully.", "green")
+            try:
+                proc.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                pass  # docker-compose is still finishing up; the server is ready
+            return True
+    
+    print_colored("Failed to start the server. Please start it manually.", "red")
+    return False
 
-def test_endpoint(endpoint, method, data=None, description="", expected_status=200):
-    """Test an API endpoint and return the response"""
+def test_endpoint(endpoint, method, data=None, description="", expected_status=200, parse=True):
+    """
+    Test an API endpoint and return the response
+    
+    With parse=False the body is returned as raw bytes unless it is being
+    displayed, for callers that only check the status code.
+    """
     url = f"{BASE_URL}{endpoint}"
     print_colored(f"\nTesting {description}", "yellow")
     print(f"{method} {url}")
     
-    if data:
+    if data and VERBOSE:
         print("Request data:")
         print(json.dumps(data, indent=2))
     
     response = None
     try:
         if method.upper() == "GET":
-            response = requests.get(url, timeout=10)
+            response = SESSION.get(url, timeout=10)
         elif method.upper() == "POST":
-            response = requests.post(url, json=data, timeout=10)
+            response = SESSION.post(url, json=data, timeout=10)
         elif method.upper() == "PUT":
-            response = requests.put(url, json=data, timeout=10)
+            response = SESSION.put(url, json=data, timeout=10)
         elif method.upper() == "DELETE":
-            response = requests.delete(url, timeout=10)
+            response = SESSION.delete(url, timeout=10)
         else:
             print_colored(f"Unsupported method: {method}", "red")
             return None
@@ -92,15 +120,21 @@ def test_endpoint(endpoint, method, data=None, description="", expected_status=2
     else:
         print_colored(f"✗ Status code: {response.status_code} (Expected: {expected_status})", "red")
     
+    if not parse and not VERBOSE:
+        return response.content
+    
     # Display response
-    print("Response:")
     try:
         response_json = response.json()
-        print(json.dumps(response_json, indent=2))
-        return response_json
     except ValueError:
-        print(response.text)
+        if VERBOSE:
+            print("Response:")
+            print(response.text)
         return response.text
+    if VERBOSE:
+        print("Response:")
+        print(json.dumps(response_json, indent=2))
+    return response_json
 
 def main():
     """Main function to run all API tests"""
@@ -114,7 +148,8 @@ def main():
     
     # Test 1: Get available tickets
     print_colored("\n===== Test 1: Get Available Tickets =====", "yellow")
-    available_response = test_endpoint("/tickets/available", "GET", description="Get available tickets")
+    available_response = test_endpoint("/tickets/available", "GET", description="Get available tickets",
+                                       parse=False)
     
     # Test 2: Book a ticket for a senior citizen (should get lower berth)
     print_colored("\n===== Test 2: Book Ticket for Senior Citizen =====", "yellow")
@@ -170,12 +205,13 @@ def main():
     
     # Test 4: Get all booked tickets
     print_colored("\n===== Test 4: Get All Booked Tickets =====", "yellow")
-    booked_response = test_endpoint("/tickets/booked", "GET", description="Get all booked tickets")
+    booked_response = test_endpoint("/tickets/booked", "GET", description="Get all booked tickets",
+                                    parse=False)
     
     # Test 5: Cancel a ticket
     print_colored("\n===== Test 5: Cancel Ticket =====", "yellow")
     cancel_response = test_endpoint(f"/tickets/cancel/{senior_ticket_id}", "POST", 
-                                    description="Cancel ticket")
+                                    description="Cancel ticket", parse=False)
     
     # Test 6: Book multiple tickets to test RAC
     print_colored("\n===== Test 6: Book Multiple Tickets (Testing RAC) =====", "yellow")
@@ -194,18 +230,20 @@ def main():
             ]
         }
         multi_response = test_endpoint("/tickets/book", "POST", multi_data, 
-                                      f"Book ticket batch {i}", 201)
+                                      f"Book ticket batch {i}", 201, parse=False)
         time.sleep(1)
     
     # Test 7: Get updated available tickets
     print_colored("\n===== Test 7: Get Updated Available Tickets =====", "yellow")
     updated_available_response = test_endpoint("/tickets/available", "GET", 
-                                              description="Get updated available tickets")
+                                              description="Get updated available tickets",
+                                              parse=False)
     
     # Test 8: Final check of all booked tickets
     print_colored("\n===== Test 8: Final Check of All Booked Tickets =====", "yellow")
     final_booked_response = test_endpoint("/tickets/booked", "GET", 
-                                         description="Final check of all booked tickets")
+                                         description="Final check of all booked tickets",
+                                         parse=False)
     
     print_colored("\n===== All API Tests Completed =====", "green")
 
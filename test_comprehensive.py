@@ -1,48 +1,88 @@
 #!/usr/bin/env python
 import requests
+from requests.adapters import HTTPAdapter
+import os
 import json
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pprint import pprint
 
 BASE_URL = "http://127.0.0.1:5005/api/v1/tickets"
 
+# One keep-alive session for every request instead of a new connection each time;
+# the pool is sized to cover the concurrent bulk bookings
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=0))
+
+# Pretty-print response bodies and snapshots only when TEST_VERBOSE is set
+VERBOSE = bool(os.environ.get("TEST_VERBOSE"))
+
+# Concurrent requests used to fill berths and clean up in bulk
+BOOKING_WORKERS = 16
+
 def check_health():
     """Verify the health check endpoint is working"""
-    response = requests.get(f"{BASE_URL}/health")
+    response = SESSION.get(f"{BASE_URL}/health")
     print(f"Health Check: {response.status_code}")
     assert response.status_code == 200
     return response.json()
 
 def get_available_tickets():
     """Get available tickets information"""
-    response = requests.get(f"{BASE_URL}/available")
+    response = SESSION.get(f"{BASE_URL}/available")
     print(f"Available Tickets: {response.status_code}")
     assert response.status_code == 200
     return response.json()
 
 def get_booked_tickets():
     """Get all booked tickets"""
-    response = requests.get(f"{BASE_URL}/booked")
+    response = SESSION.get(f"{BASE_URL}/booked")
     print(f"Booked Tickets: {response.status_code}")
     assert response.status_code == 200
     return response.json()
 
 def book_tickets(passengers_data):
     """Book tickets for multiple passengers"""
-    response = requests.post(
+    response = SESSION.post(
         f"{BASE_URL}/book",
         json={"passengers": passengers_data}
     )
     print(f"Book Ticket: {response.status_code}")
-    pprint(response.json())
-    return response.json(), response.status_code
+    response_json = response.json()
+    if VERBOSE:
+        pprint(response_json)
+    return response_json, response.status_code
 
 def cancel_ticket(ticket_id):
     """Cancel a specific ticket"""
-    response = requests.delete(f"{BASE_URL}/cancel/{ticket_id}")
+    response = SESSION.delete(f"{BASE_URL}/cancel/{ticket_id}")
     print(f"Cancel Ticket {ticket_id}: {response.status_code}")
-    pprint(response.json())
-    return response.json(), response.status_code
+    response_json = response.json()
+    if VERBOSE:
+        pprint(response_json)
+    assert response.status_code == 200, f"Cancelling ticket {ticket_id} failed: {response_json}"
+    return response_json, response.status_code
+
+def book_many(count, name_prefix, age, gender):
+    """Book count single-passenger tickets concurrently, returning the ticket IDs"""
+    # Build every payload up front; only the name differs between them
+    template = {"age": age, "gender": gender, "is_parent": False}
+    payloads = [[{"name": f"{name_prefix} {i+1}", **template}] for i in range(count)]
+    
+    def book_one(passengers):
+        booking_response, status_code = book_tickets(passengers)
+        assert status_code == 201
+        return booking_response.get("ticket_id")
+    
+    with ThreadPoolExecutor(BOOKING_WORKERS) as executor:
+        return list(executor.map(book_one, payloads))
+
+def cancel_many(ticket_ids):
+    """Cancel the given tickets one at a time, in order"""
+    # Each cancellation promotes RAC and waiting tickets, so running them
+    # concurrently would make the promotions race with the next cancellation
+    for ticket_id in ticket_ids:
+        cancel_ticket(ticket_id)
 
 def test_scenario_1():
     """Test booking a single passenger"""
@@ -65,10 +105,11 @@ def test_scenario_1():
     
     # Check available tickets after booking
     available_after = get_available_tickets()
-    print("\nAvailable tickets before booking:")
-    pprint(available_before)
-    print("\nAvailable tickets after booking:")
-    pprint(available_after)
+    if VERBOSE:
+        print("\nAvailable tickets before booking:")
+        pprint(available_before)
+        print("\nAvailable tickets after booking:")
+        pprint(available_after)
     
     # Check that one lower berth was allocated (senior gets priority)
     assert available_before["available_berths"]["lower"] - 1 == available_after["available_berths"]["lower"]
@@ -111,35 +152,30 @@ def test_scenario_2():
     
     # Get booked tickets
     booked_tickets = get_booked_tickets()
-    print("\nBooked tickets:")
-    pprint(booked_tickets["confirmed"])
+    if VERBOSE:
+        print("\nBooked tickets:")
+        pprint(booked_tickets["confirmed"])
     
     # Cancel the ticket
     cancel_ticket(ticket_id)
 
 def test_scenario_3():
-    """Test RAC allocation"""
+    """
+    Test RAC allocation
+    
+    Leaves every confirmed berth booked for scenario 4, which would otherwise
+    have to fill them again and run past the /book and /cancel rate limits.
+    Returns the IDs of the tickets still held.
+    """
     print("\n===== SCENARIO 3: Test RAC allocation =====")
     # Get initial available tickets
     available_before = get_available_tickets()
     
     # Book tickets to fill all confirmed berths first
-    confirmed_tickets = []
     confirmed_available = available_before["confirmed_available"]
     
     print(f"Booking {confirmed_available} tickets to fill all confirmed berths...")
-    for i in range(confirmed_available):
-        passengers = [
-            {
-                "name": f"Passenger Confirmed {i+1}",
-                "age": 30,
-                "gender": "Male",
-                "is_parent": False
-            }
-        ]
-        booking_response, status_code = book_tickets(passengers)
-        assert status_code == 201
-        confirmed_tickets.append(booking_response.get("ticket_id"))
+    confirmed_tickets = book_many(confirmed_available, "Passenger Confirmed", 30, "Male")
     
     # Now book one more ticket that should go to RAC
     print("\nBooking one more ticket that should go to RAC...")
@@ -174,49 +210,30 @@ def test_scenario_3():
     time.sleep(1)  # Give system time to process
     booked_tickets = get_booked_tickets()
     
-    # Clean up remaining tickets
-    for ticket_id in confirmed_tickets[1:]:
-        cancel_ticket(ticket_id)
-    cancel_ticket(rac_ticket_id)
+    # Keep the remaining tickets; scenario 4 cancels them
+    return confirmed_tickets[1:] + [rac_ticket_id]
 
-def test_scenario_4():
-    """Test waiting list allocation and promotion"""
+def test_scenario_4(held_tickets):
+    """
+    Test waiting list allocation and promotion
+    
+    Args:
+        held_tickets: IDs of the tickets scenario 3 left booked
+    """
     print("\n===== SCENARIO 4: Test waiting list allocation and promotion =====")
     available_before = get_available_tickets()
     
-    # Book tickets to fill all confirmed berths
-    confirmed_tickets = []
+    # Book any confirmed berths scenario 3 left free
     confirmed_available = available_before["confirmed_available"]
     
-    print(f"Booking {confirmed_available} tickets to fill all confirmed berths...")
-    for i in range(confirmed_available):
-        passengers = [
-            {
-                "name": f"Passenger Confirmed {i+1}",
-                "age": 30,
-                "gender": "Male",
-                "is_parent": False
-            }
-        ]
-        booking_response, _ = book_tickets(passengers)
-        confirmed_tickets.append(booking_response.get("ticket_id"))
-    
-    # Book tickets to fill all RAC berths
-    rac_tickets = []
+    print(f"Booking {confirmed_available} tickets to fill the remaining confirmed berths...")
+    confirmed_tickets = book_many(confirmed_available, "Passenger Confirmed", 30, "Male")
+    
+    # Book tickets to fill all RAC berths, only once every confirmed berth is taken
     rac_available = available_before["rac_available"]
     
     print(f"\nBooking {rac_available} tickets to fill all RAC berths...")
-    for i in range(rac_available):
-        passengers = [
-            {
-                "name": f"Passenger RAC {i+1}",
-                "age": 35,
-                "gender": "Female",
-                "is_parent": False
-            }
-        ]
-        booking_response, _ = book_tickets(passengers)
-        rac_tickets.append(booking_response.get("ticket_id"))
+    rac_tickets = book_many(rac_available, "Passenger RAC", 35, "Female")
     
     # Now book one more ticket that should go to waiting list
     print("\nBooking one more ticket that should go to waiting list...")
@@ -252,11 +269,7 @@ def test_scenario_4():
     booked_tickets = get_booked_tickets()
     
     # Clean up remaining tickets
-    for ticket_id in confirmed_tickets:
-        cancel_ticket(ticket_id)
-    for ticket_id in rac_tickets[1:]:
-        cancel_ticket(ticket_id)
-    cancel_ticket(waiting_ticket_id)
+    cancel_many(held_tickets + confirmed_tickets + rac_tickets[1:] + [waiting_ticket_id])
 
 def test_scenario_5():
     """Test priority allocation (senior citizens, ladies with children)"""
@@ -328,8 +341,8 @@ def main():
         # Run test scenarios
         test_scenario_1()
         test_scenario_2()
-        test_scenario_3()
-        test_scenario_4()
+        held_tickets = test_scenario_3()
+        test_scenario_4(held_tickets)
         test_scenario_5()
         
         print("\n===============================================")
@@ -5,50 +5,76 @@ This script specifically tests the priority allocation logic for seniors and fam
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+import orjson
 import json
 import time
 import sys
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pprint import pprint
 
-# Set API base URL
-BASE_URL = "http://localhost:5005/api/v1/tickets"
+# Set API base URL; a literal address so new pooled connections skip the
+# resolver (and a failed IPv6 attempt on hosts where localhost is ::1 first)
+BASE_URL = "http://127.0.0.1:5005/api/v1/tickets"
+
+# Pretty-print response bodies only when TEST_VERBOSE is set
+VERBOSE = bool(os.environ.get("TEST_VERBOSE"))
+
+# Run the test cases concurrently when TEST_PARALLEL is set; each needs only a
+# few lower berths, so they can share a freshly reset database
+PARALLEL = bool(os.environ.get("TEST_PARALLEL"))
+
+# One keep-alive session for every request instead of a new connection each time
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=20, pool_maxsize=20))
+
+# Request bodies are encoded with orjson and sent with this header
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Escape codes are built once at import rather than on every call, and
+# each line goes out in a single write
+_COLORS = {
+    'green': '\033[0;32m',
+    'red': '\033[0;31m',
+    'yellow': '\033[0;33m',
+    'blue': '\033[0;34m',
+    'purple': '\033[0;35m',
+    'cyan': '\033[0;36m',
+    'nc': '\033[0m'  # No Color
+}
+_NC = _COLORS['nc']
+_LINE_END = _NC + '\n'
 
 def print_colored(text, color):
     """Print colored text to the console"""
-    colors = {
-        'green': '\033[0;32m',
-        'red': '\033[0;31m',
-        'yellow': '\033[0;33m',
-        'blue': '\033[0;34m',
-        'purple': '\033[0;35m',
-        'cyan': '\033[0;36m',
-        'nc': '\033[0m'  # No Color
-    }
-    print(f"{colors.get(color, colors['nc'])}{text}{colors['nc']}")
+    sys.stdout.write(_COLORS.get(color, _NC) + str(text) + _LINE_END)
 
 def get_available_tickets():
     """Get available tickets information"""
-    response = requests.get(f"{BASE_URL}/available")
+    response = SESSION.get(f"{BASE_URL}/available")
     print_colored(f"Available Tickets: {response.status_code}", "blue")
-    return response.json()
+    return orjson.loads(response.content)
 
 def get_booked_tickets():
     """Get all booked tickets"""
-    response = requests.get(f"{BASE_URL}/booked")
+    response = SESSION.get(f"{BASE_URL}/booked")
     print_colored(f"Booked Tickets: {response.status_code}", "blue")
-    return response.json()
+    return orjson.loads(response.content)
 
 def book_tickets(passengers_data, expected_status=201):
     """Book tickets for multiple passengers"""
-    response = requests.post(
+    response = SESSION.post(
         f"{BASE_URL}/book",
-        json={"passengers": passengers_data}
+        data=orjson.dumps({"passengers": passengers_data}),
+        headers=JSON_HEADERS
     )
     print_colored(f"Book Ticket: {response.status_code}", "green" if response.status_code == expected_status else "red")
     
     try:
-        response_data = response.json()
-        pprint(response_data)
+        response_data = orjson.loads(response.content)
+        if VERBOSE:
+            pprint(response_data)
         return response_data, response.status_code
     except:
         print("Failed to parse response as JSON")
@@ -56,282 +82,120 @@ def book_tickets(passengers_data, expected_status=201):
 
 def cancel_ticket(ticket_id):
     """Cancel a specific ticket"""
-    response = requests.delete(f"{BASE_URL}/cancel/{ticket_id}")
+    response = SESSION.delete(f"{BASE_URL}/cancel/{ticket_id}")
     print_colored(f"Cancel Ticket {ticket_id}: {response.status_code}", "yellow")
     
     try:
-        response_data = response.json()
-        pprint(response_data)
+        response_data = orjson.loads(response.content)
+        if VERBOSE:
+            pprint(response_data)
         return response_data, response.status_code
     except:
         print("Failed to parse response as JSON")
         return None, response.status_code
 
-def test_senior_priority():
-    """Test priority allocation for senior citizens"""
-    print_colored("\n===== Test Case: Senior Priority Allocation =====", "cyan")
-    
-    # Check available berths
+def enough_lower_berths(minimum=2):
+    """Pre-check shared by the test cases: are there lower berths to hand out?"""
     available = get_available_tickets()
-    if available["available_berths"]["lower"] < 2:
+    if available["available_berths"]["lower"] < minimum:
         print_colored("Not enough lower berths available for testing. Please reset the database.", "red")
         return False
-    
-    # Book a ticket with both senior and non-senior passengers
-    passengers = [
-        {
-            "name": "Senior Citizen 1",
-            "age": 65,
-            "gender": "Male"
-        },
-        {
-            "name": "Adult 1",
-            "age": 35,
-            "gender": "Male"
-        },
-        {
-            "name": "Senior Citizen 2",
-            "age": 70,
-            "gender": "Female"
-        },
-        {
-            "name": "Adult 2",
-            "age": 30,
-            "gender": "Female"
-        }
-    ]
-    
-    print_colored("\nBooking ticket with senior citizens and regular adults...", "yellow")
-    booking_response, status_code = book_tickets(passengers)
-    
-    if status_code != 201 or not booking_response:
-        print_colored("Failed to book ticket", "red")
-        return False
-    
-    ticket_id = booking_response.get("ticket_id")
-    ticket_passengers = booking_response.get("passengers", [])
-    
-    # Verify that seniors got lower berths
-    senior_1 = next((p for p in ticket_passengers if p["name"] == "Senior Citizen 1"), None)
-    senior_2 = next((p for p in ticket_passengers if p["name"] == "Senior Citizen 2"), None)
-    adult_1 = next((p for p in ticket_passengers if p["name"] == "Adult 1"), None)
-    adult_2 = next((p for p in ticket_passengers if p["name"] == "Adult 2"), None)
-    
-    print_colored("\nChecking berth allocation...", "yellow")
-    seniors_with_lower = 0
-    
-    if senior_1 and senior_1["berth"] == "lower":
-        print_colored("✓ Senior Citizen 1 received lower berth as expected", "green")
-        seniors_with_lower += 1
-    elif senior_1:
-        print_colored(f"✗ Senior Citizen 1 received {senior_1['berth']} berth instead of lower", "red")
-    
-    if senior_2 and senior_2["berth"] == "lower":
-        print_colored("✓ Senior Citizen 2 received lower berth as expected", "green")
-        seniors_with_lower += 1
-    elif senior_2:
-        print_colored(f"✗ Senior Citizen 2 received {senior_2['berth']} berth instead of lower", "red")
-    
-    if adult_1:
-        print_colored(f"Adult 1 received {adult_1['berth']} berth", "blue")
-    
-    if adult_2:
-        print_colored(f"Adult 2 received {adult_2['berth']} berth", "blue")
-    
-    # Clean up
-    print_colored("\nCleaning up...", "yellow")
-    cancel_ticket(ticket_id)
-    
-    # Return test result
-    if seniors_with_lower == 2:
-        print_colored("✓ Test passed: All seniors received lower berths", "green")
-        return True
-    else:
-        print_colored(f"✗ Test failed: Only {seniors_with_lower}/2 seniors received lower berths", "red")
-        return False
+    return True
 
-def test_family_priority():
-    """Test priority allocation for families with small children"""
-    print_colored("\n===== Test Case: Family Priority Allocation =====", "cyan")
-    
-    # Check available berths
-    available = get_available_tickets()
-    if available["available_berths"]["lower"] < 2:
-        print_colored("Not enough lower berths available for testing. Please reset the database.", "red")
-        return False
-    
-    # Book a ticket with parents with small children and regular adults
-    passengers = [
-        {
-            "name": "Parent 1",
-            "age": 35,
-            "gender": "Female",
-            "is_parent": True,
-            "parent_identifier": "family1"
-        },
-        {
-            "name": "Child 1",
-            "age": 4,  # Child below 5 years
-            "gender": "Male",
-            "is_parent": False,
-            "parent_identifier": "family1"
-        },
-        {
-            "name": "Parent 2",
-            "age": 32,
-            "gender": "Female",
-            "is_parent": True,
-            "parent_identifier": "family2"
-        },
-        {
-            "name": "Child 2",
-            "age": 3,  # Child below 5 years
-            "gender": "Female",
-            "is_parent": False,
-            "parent_identifier": "family2"
-        },
-        {
-            "name": "Regular Adult 1",
-            "age": 40,
-            "gender": "Male"
-        },
-        {
-            "name": "Regular Adult 2",
-            "age": 38,
-            "gender": "Female"
-        }
-    ]
-    
-    print_colored("\nBooking ticket with parents with small children and regular adults...", "yellow")
-    booking_response, status_code = book_tickets(passengers)
-    
-    if status_code != 201 or not booking_response:
-        print_colored("Failed to book ticket", "red")
-        return False
-    
-    ticket_id = booking_response.get("ticket_id")
-    ticket_passengers = booking_response.get("passengers", [])
-    
-    # Verify that parents with small children got lower berths
-    parent_1 = next((p for p in ticket_passengers if p["name"] == "Parent 1"), None)
-    parent_2 = next((p for p in ticket_passengers if p["name"] == "Parent 2"), None)
-    regular_1 = next((p for p in ticket_passengers if p["name"] == "Regular Adult 1"), None)
-    regular_2 = next((p for p in ticket_passengers if p["name"] == "Regular Adult 2"), None)
-    
-    print_colored("\nChecking berth allocation...", "yellow")
-    parents_with_lower = 0
-    
-    if parent_1 and parent_1["berth"] == "lower":
-        print_colored("✓ Parent 1 received lower berth as expected", "green")
-        parents_with_lower += 1
-    elif parent_1:
-        print_colored(f"✗ Parent 1 received {parent_1['berth']} berth instead of lower", "red")
-    
-    if parent_2 and parent_2["berth"] == "lower":
-        print_colored("✓ Parent 2 received lower berth as expected", "green")
-        parents_with_lower += 1
-    elif parent_2:
-        print_colored(f"✗ Parent 2 received {parent_2['berth']} berth instead of lower", "red")
-    
-    if regular_1:
-        print_colored(f"Regular Adult 1 received {regular_1['berth']} berth", "blue")
-    
-    if regular_2:
-        print_colored(f"Regular Adult 2 received {regular_2['berth']} berth", "blue")
-    
-    # Clean up
-    print_colored("\nCleaning up...", "yellow")
-    cancel_ticket(ticket_id)
-    
-    # Return test result
-    if parents_with_lower == 2:
-        print_colored("✓ Test passed: All parents with small children received lower berths", "green")
-        return True
-    else:
-        print_colored(f"✗ Test failed: Only {parents_with_lower}/2 parents received lower berths", "red")
-        return False
+# Priority allocation scenarios: each books one ticket and expects the listed
+# passengers to get lower berths; the others' berths are only reported
+SCENARIOS = [
+    {
+        "title": "Senior Priority Allocation",
+        "description": "senior citizens and regular adults",
+        "passengers": [
+            {"name": "Senior Citizen 1", "age": 65, "gender": "Male"},
+            {"name": "Adult 1", "age": 35, "gender": "Male"},
+            {"name": "Senior Citizen 2", "age": 70, "gender": "Female"},
+            {"name": "Adult 2", "age": 30, "gender": "Female"}
+        ],
+        "expect_lower": ["Senior Citizen 1", "Senior Citizen 2"],
+        "others": ["Adult 1", "Adult 2"],
+        "passed": "All seniors received lower berths",
+        "group": "seniors"
+    },
+    {
+        "title": "Family Priority Allocation",
+        "description": "parents with small children and regular adults",
+        "passengers": [
+            {"name": "Parent 1", "age": 35, "gender": "Female", "is_parent": True, "parent_identifier": "family1"},
+            {"name": "Child 1", "age": 4, "gender": "Male", "is_parent": False, "parent_identifier": "family1"},
+            {"name": "Parent 2", "age": 32, "gender": "Female", "is_parent": True, "parent_identifier": "family2"},
+            {"name": "Child 2", "age": 3, "gender": "Female", "is_parent": False, "parent_identifier": "family2"},
+            {"name": "Regular Adult 1", "age": 40, "gender": "Male"},
+            {"name": "Regular Adult 2", "age": 38, "gender": "Female"}
+        ],
+        "expect_lower": ["Parent 1", "Parent 2"],
+        "others": ["Regular Adult 1", "Regular Adult 2"],
+        "passed": "All parents with small children received lower berths",
+        "group": "parents"
+    },
+    {
+        "title": "Mixed Priority Allocation",
+        "description": "senior, parent with small child, and regular adult",
+        "passengers": [
+            {"name": "Senior Citizen", "age": 68, "gender": "Male"},
+            {"name": "Parent", "age": 34, "gender": "Female", "is_parent": True, "parent_identifier": "family1"},
+            {"name": "Child", "age": 3, "gender": "Female", "is_parent": False, "parent_identifier": "family1"},
+            {"name": "Regular Adult", "age": 42, "gender": "Male"}
+        ],
+        "expect_lower": ["Senior Citizen", "Parent"],
+        "others": ["Regular Adult"],
+        "passed": "Both senior and parent received lower berths",
+        "group": "priority passengers"
+    }
+]
 
-def test_mixed_priority():
-    """Test priority allocation when there's a mix of seniors and families with children"""
-    print_colored("\n===== Test Case: Mixed Priority Allocation =====", "cyan")
+def run_scenario(scenario):
+    """Book a scenario's ticket, check who got lower berths, then cancel it"""
+    print_colored(f"\n===== Test Case: {scenario['title']} =====", "cyan")
     
     # Check available berths
-    available = get_available_tickets()
-    if available["available_berths"]["lower"] < 2:
-        print_colored("Not enough lower berths available for testing. Please reset the database.", "red")
+    if not enough_lower_berths():
         return False
     
-    # Book a ticket with seniors, parents with small children, and regular adults
-    passengers = [
-        {
-            "name": "Senior Citizen",
-            "age": 68,
-            "gender": "Male"
-        },
-        {
-            "name": "Parent",
-            "age": 34,
-            "gender": "Female",
-            "is_parent": True,
-            "parent_identifier": "family1"
-        },
-        {
-            "name": "Child",
-            "age": 3,  # Child below 5 years
-            "gender": "Female",
-            "is_parent": False,
-            "parent_identifier": "family1"
-        },
-        {
-            "name": "Regular Adult",
-            "age": 42,
-            "gender": "Male"
-        }
-    ]
-    
-    print_colored("\nBooking ticket with senior, parent with small child, and regular adult...", "yellow")
-    booking_response, status_code = book_tickets(passengers)
+    print_colored(f"\nBooking ticket with {scenario['description']}...", "yellow")
+    booking_response, status_code = book_tickets(scenario["passengers"])
     
     if status_code != 201 or not booking_response:
         print_colored("Failed to book ticket", "red")
         return False
     
     ticket_id = booking_response.get("ticket_id")
-    ticket_passengers = booking_response.get("passengers", [])
-    
-    # Verify priority allocation
-    senior = next((p for p in ticket_passengers if p["name"] == "Senior Citizen"), None)
-    parent = next((p for p in ticket_passengers if p["name"] == "Parent"), None)
-    regular = next((p for p in ticket_passengers if p["name"] == "Regular Adult"), None)
+    by_name = {p["name"]: p for p in booking_response.get("passengers", [])}
     
     print_colored("\nChecking berth allocation...", "yellow")
-    priority_with_lower = 0
-    
-    if senior and senior["berth"] == "lower":
-        print_colored("✓ Senior Citizen received lower berth as expected", "green")
-        priority_with_lower += 1
-    elif senior:
-        print_colored(f"✗ Senior Citizen received {senior['berth']} berth instead of lower", "red")
+    with_lower = 0
     
-    if parent and parent["berth"] == "lower":
-        print_colored("✓ Parent received lower berth as expected", "green")
-        priority_with_lower += 1
-    elif parent:
-        print_colored(f"✗ Parent received {parent['berth']} berth instead of lower", "red")
+    for name in scenario["expect_lower"]:
+        passenger = by_name.get(name)
+        if passenger and passenger["berth"] == "lower":
+            print_colored(f"✓ {name} received lower berth as expected", "green")
+            with_lower += 1
+        elif passenger:
+            print_colored(f"✗ {name} received {passenger['berth']} berth instead of lower", "red")
     
-    if regular:
-        print_colored(f"Regular Adult received {regular['berth']} berth", "blue")
+    for name in scenario["others"]:
+        passenger = by_name.get(name)
+        if passenger:
+            print_colored(f"{name} received {passenger['berth']} berth", "blue")
     
     # Clean up
     print_colored("\nCleaning up...", "yellow")
     cancel_ticket(ticket_id)
     
     # Return test result
-    if priority_with_lower == 2:
-        print_colored("✓ Test passed: Both senior and parent received lower berths", "green")
+    expected = len(scenario["expect_lower"])
+    if with_lower == expected:
+        print_colored(f"✓ Test passed: {scenario['passed']}", "green")
         return True
     else:
-        print_colored(f"✗ Test failed: Only {priority_with_lower}/2 priority passengers received lower berths", "red")
+        print_colored(f"✗ Test failed: Only {with_lower}/{expected} {scenario['group']} received lower berths", "red")
         return False
 
 def main():
@@ -342,7 +206,7 @@ def main():
     
     # First, check server status
     try:
-        response = requests.get(f"{BASE_URL}/health")
+        response = SESSION.get(f"{BASE_URL}/health")
         if response.status_code == 200:
             print_colored("Server is running.", "green")
         else:
@@ -352,27 +216,16 @@ def main():
         print_colored(f"Server is not running: {e}", "red")
         sys.exit(1)
     
-    # Run test cases
-    tests_passed = 0
-    tests_failed = 0
-    
-    # Test 1: Senior priority
-    if test_senior_priority():
-        tests_passed += 1
-    else:
-        tests_failed += 1
-    
-    # Test 2: Family priority
-    if test_family_priority():
-        tests_passed += 1
+    # Run test cases. They are independent, so with PARALLEL they run at the
+    # same time (their output interleaves)
+    if PARALLEL:
+        with ThreadPoolExecutor(len(SCENARIOS)) as executor:
+            results = list(executor.map(run_scenario, SCENARIOS))
     else:
-        tests_failed += 1
+        results = [run_scenario(scenario) for scenario in SCENARIOS]
     
-    # Test 3: Mixed priority
-    if test_mixed_priority():
-        tests_passed += 1
-    else:
-        tests_failed += 1
+    tests_passed = sum(1 for result in results if result)
+    tests_failed = len(results) - tests_passed
     
     # Print summary
     print_colored("\n===============================================", "blue")
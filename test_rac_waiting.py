@@ -5,26 +5,55 @@ This script tests RAC and Waiting List functionality by booking many tickets
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+import orjson
 import json
 import time
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
 
-# Set API base URL
-BASE_URL = "http://localhost:5005/api/v1"
-SERVER_URL = "http://localhost:5005"
+# Set API base URL; a literal address so new pooled connections skip the
+# resolver (and a failed IPv6 attempt on hosts where localhost is ::1 first)
+BASE_URL = "http://127.0.0.1:5005/api/v1"
+SERVER_URL = "http://127.0.0.1:5005"
+
+# Pretty-print request and response bodies only when TEST_VERBOSE is set
+VERBOSE = bool(os.environ.get("TEST_VERBOSE"))
+
+# One keep-alive session for every request instead of a new connection each time
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=20, pool_maxsize=20))
+
+# Request bodies are encoded with orjson and sent with this header
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Bookings in flight at once while filling each phase
+PHASE_WORKERS = 10
+
+# Passengers per ticket when filling the confirmed berths; the RAC and waiting
+# list phases book one passenger per ticket so each lands in a single bucket
+CONFIRMED_BATCH_SIZE = 6
+
+# Delays (seconds) before retrying a booking the rate limiter rejected with 429
+RATE_LIMIT_BACKOFF = (0.05, 0.2, 0.5)
+
+# Escape codes are built once at import rather than on every call, and
+# each line goes out in a single write
+_COLORS = {
+    'green': '\033[0;32m',
+    'red': '\033[0;31m',
+    'yellow': '\033[0;33m',
+    'blue': '\033[0;34m',
+    'purple': '\033[0;35m',
+    'nc': '\033[0m'  # No Color
+}
+_NC = _COLORS['nc']
+_LINE_END = _NC + '\n'
 
 def print_colored(text, color):
     """Print colored text to the console"""
-    colors = {
-        'green': '\033[0;32m',
-        'red': '\033[0;31m',
-        'yellow': '\033[0;33m',
-        'blue': '\033[0;34m',
-        'purple': '\033[0;35m',
-        'nc': '\033[0m'  # No Color
-    }
-    print(f"{colors.get(color, colors['nc'])}{text}{colors['nc']}")
+    sys.stdout.write(_COLORS.get(color, _NC) + str(text) + _LINE_END)
 
 def test_endpoint(endpoint, method, data=None, description="", expected_status=200):
     """Test an API endpoint and return the response"""
@@ -32,18 +61,18 @@ def test_endpoint(endpoint, method, data=None, description="", expected_status=2
     print_colored(f"\nTesting {description}", "yellow")
     print(f"{method} {url}")
     
-    if data:
+    if data and VERBOSE:
         print("Request data:")
         print(json.dumps(data, indent=2))
     
     response = None
     try:
         if method.upper() == "GET":
-            response = requests.get(url, timeout=10)
+            response = SESSION.get(url, timeout=10)
         elif method.upper() == "POST":
-            response = requests.post(url, json=data, timeout=10)
+            response = SESSION.post(url, data=orjson.dumps(data), headers=JSON_HEADERS, timeout=10)
         elif method.upper() == "DELETE":
-            response = requests.delete(url, timeout=10)
+            response = SESSION.delete(url, timeout=10)
         else:
             print_colored(f"Unsupported method: {method}", "red")
             return None
@@ -58,14 +87,103 @@ def test_endpoint(endpoint, method, data=None, description="", expected_status=2
         print_colored(f"✗ Status code: {response.status_code} (Expected: {expected_status})", "red")
     
     # Display response
-    print("Response:")
     try:
-        response_json = response.json()
-        print(json.dumps(response_json, indent=2))
-        return response_json
+        response_json = orjson.loads(response.content)
     except ValueError:
-        print(response.text)
+        if VERBOSE:
+            print("Response:")
+            print(response.text)
         return response.text
+    if VERBOSE:
+        print("Response:")
+        print(json.dumps(response_json, indent=2))
+    return response_json
+
+class AvailCache:
+    """
+    Last known availability, kept current from booking responses
+    
+    Each booked passenger is taken off the bucket of its ticket's status. The
+    status in each booking response is the server's own verdict, so a bucket
+    is known to be full without polling /tickets/available.
+    """
+    KEYS = {
+        "confirmed": "confirmed_available",
+        "rac": "rac_available",
+        "waiting": "waiting_list_available"
+    }
+    
+    def __init__(self, available):
+        self.counts = {status: available.get(key, 0) for status, key in self.KEYS.items()}
+    
+    def record(self, response):
+        """Account for a successful booking response"""
+        status = response.get("status")
+        if status in self.counts:
+            self.counts[status] -= len(response.get("passengers", ())) or 1
+    
+    def is_full(self, status):
+        """Whether the bookings so far have used up the bucket"""
+        if self.counts[status] > 0:
+            print_colored(f"{self.counts[status]} {status} positions expected to remain", "yellow")
+            return False
+        return True
+
+def post_with_backoff(url, data):
+    """POST, backing off and retrying only while the rate limiter answers 429"""
+    body = orjson.dumps(data)
+    for delay in RATE_LIMIT_BACKOFF:
+        response = SESSION.post(url, data=body, headers=JSON_HEADERS, timeout=10)
+        if response.status_code != 429:
+            return response
+        time.sleep(delay)
+    return SESSION.post(url, data=body, headers=JSON_HEADERS, timeout=10)
+
+def book_phase(count, name_format, label, batch_size=1):
+    """
+    Book count passengers concurrently, batch_size passengers per ticket
+    
+    Bookings within a phase are independent, so they are sent PHASE_WORKERS
+    at a time and reported afterwards in booking order. Returns the parsed
+    responses in that order (None where the request failed).
+    """
+    def book_one(passenger_data):
+        try:
+            response = post_with_backoff(f"{BASE_URL}/tickets/book", passenger_data)
+            return response.status_code, orjson.loads(response.content)
+        except (requests.RequestException, ValueError) as e:
+            return None, e
+    
+    # Build every payload before any request goes out
+    batches = [range(i, min(i + batch_size, count + 1)) for i in range(1, count + 1, batch_size)]
+    payloads = [
+        {
+            "passengers": [
+                {
+                    "name": name_format.format(i),
+                    "age": 30,
+                    "gender": "male" if i % 2 == 0 else "female"
+                }
+                for i in numbers
+            ]
+        }
+        for numbers in batches
+    ]
+    
+    print_colored(f"\nBooking {count} {label} passengers on {len(batches)} tickets, "
+                  f"{PHASE_WORKERS} at a time", "yellow")
+    with ThreadPoolExecutor(PHASE_WORKERS) as executor:
+        results = list(executor.map(book_one, payloads))
+    
+    responses = []
+    for j, (numbers, (status_code, body)) in enumerate(zip(batches, results), 1):
+        passengers = f"passenger {numbers[0]}" if len(numbers) == 1 else f"passengers {numbers[0]}-{numbers[-1]}"
+        if status_code == 201:
+            print_colored(f"✓ Book {label} ticket {j}/{len(batches)} ({passengers}): {status_code}", "green")
+        else:
+            print_colored(f"✗ Book {label} ticket {j}/{len(batches)} ({passengers}): {status_code or body} (Expected: 201)", "red")
+        responses.append(body if status_code is not None else None)
+    return responses
 
 def main():
     """Main function to run the advanced tests"""
@@ -75,7 +193,7 @@ def main():
     
     # First, check server status
     try:
-        response = requests.get(SERVER_URL, timeout=5)
+        response = SESSION.get(SERVER_URL, timeout=5)
         if response.status_code == 200:
             print_colored("Server is running.", "green")
         else:
@@ -93,6 +211,8 @@ def main():
         print_colored("Failed to get initial availability. Exiting.", "red")
         sys.exit(1)
     
+    availability = AvailCache(initial_available)
+    
     # Calculate how many tickets we need to book to reach RAC
     confirmed_available = initial_available.get("confirmed_available", 0)
     print_colored(f"\nThere are {confirmed_available} confirmed berths available.", "purple")
@@ -102,111 +222,51 @@ def main():
     ticket_ids = []
     print_colored("\n===== Phase 1: Filling Confirmed Berths =====", "purple")
     
-    # Book single passenger tickets to fill confirmed berths
-    for i in range(1, confirmed_available + 1):
-        passenger_data = {
-            "passengers": [
-                {
-                    "name": f"Passenger {i:03d}",
-                    "age": 30,
-                    "gender": "male" if i % 2 == 0 else "female"
-                }
-            ]
-        }
-        
-        print_colored(f"\nBooking ticket {i}/{confirmed_available}", "yellow")
-        response = test_endpoint("/tickets/book", "POST", passenger_data, 
-                                f"Book single passenger ticket {i}", 201)
-        
+    # Book multi-passenger tickets to fill confirmed berths
+    for response in book_phase(confirmed_available, "Passenger {:03d}", "confirmed",
+                               batch_size=CONFIRMED_BATCH_SIZE):
         if response and "ticket_id" in response:
             ticket_ids.append(response["ticket_id"])
-        
-        # Sleep briefly to avoid overwhelming the server
-        time.sleep(0.2)
-        
-        # Check every 10 bookings
-        if i % 10 == 0 or i == confirmed_available:
-            avail = test_endpoint("/tickets/available", "GET", 
-                                 description=f"Check availability after {i} bookings")
-            if avail.get("confirmed_available", 0) == 0:
-                print_colored("All confirmed berths are now filled!", "green")
-                break
+            availability.record(response)
+    
+    if availability.is_full("confirmed"):
+        print_colored("All confirmed berths are now filled!", "green")
     
     # 2. Book RAC tickets
     print_colored("\n===== Phase 2: Testing RAC Allocation =====", "purple")
     rac_available = initial_available.get("rac_available", 0)
     
-    for i in range(1, rac_available + 1):
-        passenger_data = {
-            "passengers": [
-                {
-                    "name": f"RAC Passenger {i:02d}",
-                    "age": 30,
-                    "gender": "male" if i % 2 == 0 else "female"
-                }
-            ]
-        }
-        
-        print_colored(f"\nBooking RAC ticket {i}/{rac_available}", "yellow")
-        response = test_endpoint("/tickets/book", "POST", passenger_data, 
-                                f"Book RAC ticket {i}", 201)
-        
+    for response in book_phase(rac_available, "RAC Passenger {:02d}", "RAC"):
         if response and "ticket_id" in response:
             ticket_ids.append(response["ticket_id"])
+            availability.record(response)
             
             # Check if we got an RAC ticket
             if response.get("status") == "rac":
-                print_colored("Successfully received an RAC ticket!", "green")
+                print_colored(f"Ticket {response['ticket_id']}: received an RAC ticket", "green")
             else:
-                print_colored(f"Expected RAC ticket but got {response.get('status')}", "red")
-        
-        time.sleep(0.2)
-        
-        # Check every 5 RAC bookings
-        if i % 5 == 0 or i == rac_available:
-            avail = test_endpoint("/tickets/available", "GET", 
-                                 description=f"Check availability after {i} RAC bookings")
-            if avail.get("rac_available", 0) == 0:
-                print_colored("All RAC positions are now filled!", "green")
-                break
+                print_colored(f"Ticket {response['ticket_id']}: expected RAC ticket but got {response.get('status')}", "red")
+    
+    if availability.is_full("rac"):
+        print_colored("All RAC positions are now filled!", "green")
     
     # 3. Book Waiting List tickets
     print_colored("\n===== Phase 3: Testing Waiting List =====", "purple")
     waiting_available = initial_available.get("waiting_list_available", 0)
     
-    for i in range(1, waiting_available + 1):
-        passenger_data = {
-            "passengers": [
-                {
-                    "name": f"Waiting List Passenger {i:02d}",
-                    "age": 30,
-                    "gender": "male" if i % 2 == 0 else "female"
-                }
-            ]
-        }
-        
-        print_colored(f"\nBooking Waiting List ticket {i}/{waiting_available}", "yellow")
-        response = test_endpoint("/tickets/book", "POST", passenger_data, 
-                                f"Book Waiting List ticket {i}", 201)
-        
+    for response in book_phase(waiting_available, "Waiting List Passenger {:02d}", "Waiting List"):
         if response and "ticket_id" in response:
             ticket_ids.append(response["ticket_id"])
+            availability.record(response)
             
             # Check if we got a waiting list ticket
             if response.get("status") == "waiting":
-                print_colored("Successfully received a Waiting List ticket!", "green")
+                print_colored(f"Ticket {response['ticket_id']}: received a Waiting List ticket", "green")
             else:
-                print_colored(f"Expected Waiting List ticket but got {response.get('status')}", "red")
-        
-        time.sleep(0.2)
-        
-        # Check every 3 Waiting List bookings
-        if i % 3 == 0 or i == waiting_available:
-            avail = test_endpoint("/tickets/available", "GET", 
-                                 description=f"Check availability after {i} Waiting List bookings")
-            if avail.get("waiting_list_available", 0) == 0:
-                print_colored("All Waiting List positions are now filled!", "green")
-                break
+                print_colored(f"Ticket {response['ticket_id']}: expected Waiting List ticket but got {response.get('status')}", "red")
+    
+    if availability.is_full("waiting"):
+        print_colored("All Waiting List positions are now filled!", "green")
     
     # 4. Try to book when all positions are filled
     print_colored("\n===== Phase 4: Testing Booking When Full =====", "purple")
@@ -227,17 +287,15 @@ def main():
     print_colored("\n===== Final Ticket Summary =====", "purple")
     final_booked = test_endpoint("/tickets/booked", "GET", description="Get all booked tickets")
     
-    # Print statistics
+    # Print statistics from the summary the server already computes
     if final_booked:
-        confirmed_count = len(final_booked.get("confirmed", []))
-        rac_count = len(final_booked.get("rac", []))
-        waiting_count = len(final_booked.get("waiting", []))
+        summary = final_booked.get("summary", {})
         
         print_colored("\nBooking Statistics:", "blue")
-        print_colored(f"- Confirmed tickets: {confirmed_count}", "green")
-        print_colored(f"- RAC tickets: {rac_count}", "yellow")
-        print_colored(f"- Waiting List tickets: {waiting_count}", "red")
-        print_colored(f"- Total tickets booked: {confirmed_count + rac_count + waiting_count}", "purple")
+        print_colored(f"- Confirmed tickets: {summary.get('confirmed_count', 0)}", "green")
+        print_colored(f"- RAC tickets: {summary.get('rac_count', 0)}", "yellow")
+        print_colored(f"- Waiting List tickets: {summary.get('waiting_count', 0)}", "red")
+        print_colored(f"- Total tickets booked: {summary.get('total_count', 0)}", "purple")
     
     # 6. Test cancellation and automatic promotion
     print_colored("\n===== Phase 5: Testing Cancellation and Promotion =====", "purple")
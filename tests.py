@@ -1,7 +1,6 @@
 import os
 import sys
 import unittest
-import json
 import datetime
 from app import create_app
 from app.db import db
@@ -10,158 +9,237 @@ from app.models.ticket import Ticket
 from app.models.passenger import Passenger
 from app.models.berth_allocation_history import BerthAllocationHistory
 from app.config import BerthType, Config, TicketStatus
+import orjson
+from sqlalchemy import event
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+    """Stop pysqlite from issuing BEGIN and COMMIT on its own"""
+    dbapi_connection.isolation_level = None
+
+def _begin_transaction(connection):
+    """Emit the BEGIN that pysqlite no longer does"""
+    connection.exec_driver_sql('BEGIN')
+
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+# Request bodies are encoded once, at import; every test posts the same bytes
+SENIOR_BOOKING = orjson.dumps({
+    "passengers": [
+        {
+            "name": "Senior Citizen",
+            "age": 65,
+            "gender": "male"
+        }
+    ]
+})
+
+TWO_ADULTS_BOOKING = orjson.dumps({
+    "passengers": [
+        {
+            "name": "Passenger 1",
+            "age": 35,
+            "gender": "male"
+        },
+        {
+            "name": "Passenger 2",
+            "age": 40,
+            "gender": "female"
+        }
+    ]
+})
+
+CANCEL_BOOKING = orjson.dumps({
+    "passengers": [
+        {
+            "name": "To Cancel",
+            "age": 35,
+            "gender": "male"
+        }
+    ]
+})
+
+SINGLE_BOOKING = orjson.dumps({
+    "passengers": [
+        {
+            "name": "Test Passenger",
+            "age": 35,
+            "gender": "male"
+        }
+    ]
+})
+
+PARENT_CHILD_BOOKING = orjson.dumps({
+    "passengers": [
+        {
+            "name": "Parent",
+            "age": 35,
+            "gender": "female",
+            "is_parent": True,
+            "parent_identifier": "family1"
+        },
+        {
+            "name": "Child",
+            "age": 4,
+            "gender": "female",
+            "parent_identifier": "family1"
+        }
+    ]
+})
+
+WAITING_LIST_BOOKING = orjson.dumps({
+    "passengers": [
+        {
+            "name": "Waiting List Passenger",
+            "age": 35,
+            "gender": "male"
+        }
+    ]
+})
+
+CONFIRMED_BOOKING = orjson.dumps({
+    "passengers": [
+        {
+            "name": "Confirmed Passenger",
+            "age": 35,
+            "gender": "male"
+        }
+    ]
+})
+
+RAC_BOOKING = orjson.dumps({
+    "passengers": [
+        {
+            "name": "RAC Passenger",
+            "age": 40,
+            "gender": "female"
+        }
+    ]
+})
 
 class RailwayReservationTestCase(unittest.TestCase):
     """Test case for the railway reservation API"""
     
+    @classmethod
+    def setUpClass(cls):
+        """Create the app, test client and database once for the whole test case"""
+        cls.app = create_app('testing')
+        cls.client = cls.app.test_client()
+        
+        # One app context for the whole test case; requests made by the
+        # test client run inside it
+        cls.app_context = cls.app.app_context()
+        cls.app_context.push()
+        
+        # pysqlite defers BEGIN and commits on SAVEPOINT release, which would
+        # defeat the per-test rollback; let SQLAlchemy emit BEGIN instead
+        event.listen(db.engine, 'connect', _disable_pysqlite_transactions)
+        event.listen(db.engine, 'begin', _begin_transaction)
+        
+        db.create_all()
+        
+        # Initialize berths in one bulk insert
+        # Create confirmed berths (63 total)
+        # Distribution: 21 lower, 21 middle, 21 upper
+        # plus 9 side-lower berths for RAC (18 passengers, 2 per berth)
+        berth_types = [BerthType.LOWER, BerthType.MIDDLE, BerthType.UPPER] * 21 + [BerthType.SIDE_LOWER] * 9
+        db.session.execute(Berth.__table__.insert(), [{'berth_type': berth_type} for berth_type in berth_types])
+        
+        db.session.commit()
+        
+        # Verify berth initialization
+        berth_count = Berth.query.count()
+        if berth_count != Config.CONFIRMED_BERTHS + 9:  # 63 confirmed + 9 side-lower (RAC)
+            raise Exception(f"Expected {Config.CONFIRMED_BERTHS + 9} berths, found {berth_count}")
+        
+        db.session.remove()
+    
+    @classmethod
+    def tearDownClass(cls):
+        """Drop the database once all tests have run"""
+        db.session.remove()
+        db.drop_all()
+        cls.app_context.pop()
+    
     def setUp(self):
-        """Set up test client and initialize database"""
-        self.app = create_app('testing')
-        self.client = self.app.test_client()
-        
-        with self.app.app_context():
-            db.create_all()
-            
-            # Initialize berths
-            # Create confirmed berths (63 total)
-            # Distribution: 21 lower, 21 middle, 21 upper
-            for i in range(1, 22):  # 21 of each type
-                # Lower berth
-                db.session.add(Berth(berth_type=BerthType.LOWER))
-                
-                # Middle berth
-                db.session.add(Berth(berth_type=BerthType.MIDDLE))
-                
-                # Upper berth
-                db.session.add(Berth(berth_type=BerthType.UPPER))
-            
-            # Create 9 side-lower berths for RAC (18 passengers, 2 per berth)
-            for i in range(1, 10):
-                db.session.add(Berth(berth_type=BerthType.SIDE_LOWER))
-            
-            db.session.commit()
-            
-            # Verify berth initialization
-            berth_count = Berth.query.count()
-            if berth_count != Config.CONFIRMED_BERTHS + 9:  # 63 confirmed + 9 side-lower (RAC)
-                raise Exception(f"Expected {Config.CONFIRMED_BERTHS + 9} berths, found {berth_count}")
+        """Open a transaction that tearDown rolls back"""
+        self.connection = db.engine.connect()
+        self.transaction = self.connection.begin()
+        
+        # Commits made by the app and the tests only release savepoints inside
+        # this transaction, so each test starts from the seeded berths
+        self._app_session = db.session
+        db.session = scoped_session(sessionmaker(bind=self.connection, join_transaction_mode='create_savepoint'))
     
     def tearDown(self):
-        """Clean up after each test"""
-        with self.app.app_context():
-            db.session.remove()
-            db.drop_all()
+        """Roll back everything the test wrote"""
+        db.session.remove()
+        db.session = self._app_session
+        self.transaction.rollback()
+        self.connection.close()
     
     def test_book_ticket_confirmed(self):
         """Test booking a ticket with confirmed status"""
-        # Create a booking request with senior citizen
-        booking_data = {
-            "passengers": [
-                {
-                    "name": "Senior Citizen",
-                    "age": 65,
-                    "gender": "male"
-                }
-            ]
-        }
-        
         # Send the request
         response = self.client.post(
             '/api/v1/tickets/book',
-            data=json.dumps(booking_data),
-            content_type='application/json'
+            data=SENIOR_BOOKING,
+            headers=JSON_HEADERS
         )
         
         # Check response
         self.assertEqual(response.status_code, 201)
-        data = json.loads(response.data)
+        data = response.get_json()
         self.assertEqual(data['status'], 'confirmed')
         self.assertEqual(data['passengers'][0]['berth'], 'lower')
     
     def test_book_ticket_rac(self):
         """Test booking a ticket with RAC status after confirmed berths are full"""
-        with self.app.app_context():
-            # First, fill all confirmed berths except one
-            for i in range(62):
-                Berth.query.filter_by(is_allocated=False).first().is_allocated = True
-            db.session.commit()
-            
-        # Book 2 tickets (1 confirmed, 1 RAC)
-        booking_data = {
-            "passengers": [
-                {
-                    "name": "Passenger 1",
-                    "age": 35,
-                    "gender": "male"
-                },
-                {
-                    "name": "Passenger 2",
-                    "age": 40,
-                    "gender": "female"
-                }
-            ]
-        }
+        # First, fill all confirmed berths except one
+        first_free = db.session.query(Berth.id).filter_by(is_allocated=False).order_by(Berth.id).limit(62)
+        db.session.execute(
+            Berth.__table__.update().where(Berth.id.in_(first_free.scalar_subquery())).values(is_allocated=True)
+        )
+        db.session.commit()
         
-        # Send the request
+        # Book 2 tickets (1 confirmed, 1 RAC)
         response = self.client.post(
             '/api/v1/tickets/book',
-            data=json.dumps(booking_data),
-            content_type='application/json'
+            data=TWO_ADULTS_BOOKING,
+            headers=JSON_HEADERS
         )
         
         # Check response
         self.assertEqual(response.status_code, 201)
-        data = json.loads(response.data)
+        data = response.get_json()
         self.assertEqual(data['status'], 'rac')
     
     def test_cancel_ticket(self):
         """Test cancelling a ticket"""
         # First book a ticket
-        booking_data = {
-            "passengers": [
-                {
-                    "name": "To Cancel",
-                    "age": 35,
-                    "gender": "male"
-                }
-            ]
-        }
-        
-        # Book the ticket
         response = self.client.post(
             '/api/v1/tickets/book',
-            data=json.dumps(booking_data),
-            content_type='application/json'
+            data=CANCEL_BOOKING,
+            headers=JSON_HEADERS
         )
         
-        ticket_id = json.loads(response.data)['ticket_id']
+        ticket_id = response.get_json()['ticket_id']
         
         # Now cancel it
-        response = self.client.post(f'/api/v1/tickets/cancel/{ticket_id}')
+        response = self.client.delete(f'/api/v1/tickets/cancel/{ticket_id}')
         
         # Check response
         self.assertEqual(response.status_code, 200)
-        data = json.loads(response.data)
+        data = response.get_json()
         self.assertIn('message', data)
     
     def test_get_booked_tickets(self):
         """Test getting all booked tickets"""
         # First book a ticket
-        booking_data = {
-            "passengers": [
-                {
-                    "name": "Test Passenger",
-                    "age": 35,
-                    "gender": "male"
-                }
-            ]
-        }
-        
-        # Book the ticket
         self.client.post(
             '/api/v1/tickets/book',
-            data=json.dumps(booking_data),
-            content_type='application/json'
+            data=SINGLE_BOOKING,
+            headers=JSON_HEADERS
         )
         
         # Get booked tickets
@@ -169,7 +247,7 @@ class RailwayReservationTestCase(unittest.TestCase):
         
         # Check response
         self.assertEqual(response.status_code, 200)
-        data = json.loads(response.data)
+        data = response.get_json()
         self.assertIn('confirmed', data)
         self.assertIn('summary', data)
         self.assertEqual(data['summary']['total_count'], 1)
@@ -180,171 +258,131 @@ class RailwayReservationTestCase(unittest.TestCase):
         
         # Check response
         self.assertEqual(response.status_code, 200)
-        data = json.loads(response.data)
+        data = response.get_json()
         self.assertEqual(data['confirmed_available'], 63)
         self.assertEqual(data['rac_available'], 18)
         self.assertEqual(data['waiting_list_available'], 10)
     
     def test_book_ticket_with_child(self):
         """Test booking a ticket with a parent and child"""
-        booking_data = {
-            "passengers": [
-                {
-                    "name": "Parent",
-                    "age": 35,
-                    "gender": "female",
-                    "is_parent": True,
-                    "parent_identifier": "family1"
-                },
-                {
-                    "name": "Child",
-                    "age": 4,
-                    "gender": "female",
-                    "parent_identifier": "family1"
-                }
-            ]
-        }
-        
         # Send the request
         response = self.client.post(
             '/api/v1/tickets/book',
-            data=json.dumps(booking_data),
-            content_type='application/json'
+            data=PARENT_CHILD_BOOKING,
+            headers=JSON_HEADERS
         )
         
         # Check response
         self.assertEqual(response.status_code, 201)
-        data = json.loads(response.data)
+        data = response.get_json()
+        by_name = {p['name']: p for p in data['passengers']}
         
         # Parent should get a lower berth
-        parent = next(p for p in data['passengers'] if p['name'] == 'Parent')
-        self.assertEqual(parent['berth'], 'lower')
+        self.assertEqual(by_name['Parent']['berth'], 'lower')
         
         # Child under 5 should not get a berth
-        child = next(p for p in data['passengers'] if p['name'] == 'Child')
-        self.assertIsNone(child.get('berth'))
+        self.assertIsNone(by_name['Child'].get('berth'))
     
     def test_waiting_list(self):
         """Test booking tickets going to waiting list"""
-        with self.app.app_context():
-            # Make sure we have a fresh DB with all berths
-            db.session.query(Berth).update({Berth.is_allocated: False, Berth.passenger_id: None})
-            db.session.commit()
-            
-            # First, allocate all confirmed berths
-            for berth in Berth.query.filter(Berth.berth_type.in_([BerthType.LOWER, BerthType.MIDDLE, BerthType.UPPER])).all():
-                berth.is_allocated = True
-            
-            # Allocate all RAC berths
-            for berth in Berth.query.filter(Berth.berth_type == BerthType.SIDE_LOWER).all():
-                berth.is_allocated = True
-            
-            # Create tickets with all RAC positions used
-            for i in range(Config.RAC_BERTHS):
-                ticket = Ticket(status=TicketStatus.RAC, rac_position=i+1)
-                db.session.add(ticket)
-            
-            db.session.commit()
-            
-        # Try to book when all berths are allocated
-        booking_data = {
-            "passengers": [
-                {
-                    "name": "Waiting List Passenger",
-                    "age": 35,
-                    "gender": "male"
-                }
-            ]
-        }
+        # Make sure we have a fresh DB with all berths
+        db.session.query(Berth).update({Berth.is_allocated: False, Berth.passenger_id: None})
         
-        # Send the request
+        # First, allocate all confirmed berths
+        db.session.execute(
+            Berth.__table__.update()
+            .where(Berth.berth_type.in_([BerthType.LOWER, BerthType.MIDDLE, BerthType.UPPER]))
+            .values(is_allocated=True)
+        )
+        
+        # Allocate all RAC berths
+        db.session.execute(
+            Berth.__table__.update().where(Berth.berth_type == BerthType.SIDE_LOWER).values(is_allocated=True)
+        )
+        
+        # Create tickets with all RAC positions used
+        db.session.execute(
+            Ticket.__table__.insert(),
+            [{'status': TicketStatus.RAC, 'rac_position': i + 1} for i in range(Config.RAC_BERTHS)]
+        )
+        
+        db.session.commit()
+        
+        # Try to book when all berths are allocated
         response = self.client.post(
             '/api/v1/tickets/book',
-            data=json.dumps(booking_data),
-            content_type='application/json'
+            data=WAITING_LIST_BOOKING,
+            headers=JSON_HEADERS
         )
         
         # Check response
         self.assertEqual(response.status_code, 201)
-        data = json.loads(response.data)
+        data = response.get_json()
         self.assertEqual(data['status'], 'waiting')
         self.assertIsNotNone(data['passengers'][0]['waiting_position'])
     
     def test_berth_promotion(self):
         """Test berth promotion after ticket cancellation"""
-        with self.app.app_context():
-            # Make sure we have a fresh DB with all berths
-            db.session.query(Berth).update({Berth.is_allocated: False, Berth.passenger_id: None})
-            db.session.query(Ticket).delete()
-            db.session.query(Passenger).delete()
-            db.session.query(BerthAllocationHistory).delete()
-            
-            # Allocate all but 1 berth to simulate a nearly full train
-            berths = Berth.query.filter(
-                Berth.berth_type.in_([BerthType.LOWER, BerthType.MIDDLE, BerthType.UPPER])
-            ).all()
-            
-            # Leave only one berth unallocated
-            for i in range(len(berths) - 1):
-                berths[i].is_allocated = True
-            
-            db.session.commit()
+        # Make sure we have a fresh DB with all berths
+        db.session.execute(Berth.__table__.update().values(is_allocated=False, passenger_id=None))
+        for model in (Ticket, Passenger, BerthAllocationHistory):
+            db.session.execute(model.__table__.delete())
         
-        # First book a ticket for one passenger (should get confirmed status)
-        confirmed_booking = {
-            "passengers": [
-                {
-                    "name": "Confirmed Passenger",
-                    "age": 35,
-                    "gender": "male"
-                }
-            ]
-        }
+        # Allocate all but 1 berth to simulate a nearly full train
+        confirmed_types = Berth.berth_type.in_([BerthType.LOWER, BerthType.MIDDLE, BerthType.UPPER])
+        last_berth = db.session.query(db.func.max(Berth.id)).filter(confirmed_types)
         
-        # Book the confirmed ticket
+        # Leave only one berth unallocated
+        db.session.execute(
+            Berth.__table__.update()
+            .where(confirmed_types, Berth.id != last_berth.scalar_subquery())
+            .values(is_allocated=True)
+        )
+        
+        db.session.commit()
+    
+        # First book a ticket for one passenger (should get confirmed status)
         confirmed_response = self.client.post(
             '/api/v1/tickets/book',
-            data=json.dumps(confirmed_booking),
-            content_type='application/json'
+            data=CONFIRMED_BOOKING,
+            headers=JSON_HEADERS
         )
         
-        confirmed_data = json.loads(confirmed_response.data)
+        confirmed_data = confirmed_response.get_json()
         self.assertEqual(confirmed_data['status'], 'confirmed')
         confirmed_ticket_id = confirmed_data['ticket_id']
         
         # Now all berths should be allocated, so book another passenger to go to RAC
-        rac_booking = {
-            "passengers": [
-                {
-                    "name": "RAC Passenger",
-                    "age": 40,
-                    "gender": "female"
-                }
-            ]
-        }
-        
-        # Book the RAC ticket
         rac_response = self.client.post(
             '/api/v1/tickets/book',
-            data=json.dumps(rac_booking),
-            content_type='application/json'
+            data=RAC_BOOKING,
+            headers=JSON_HEADERS
         )
         
-        rac_data = json.loads(rac_response.data)
+        rac_data = rac_response.get_json()
         self.assertEqual(rac_data['status'], 'rac')
         rac_ticket_id = rac_data['ticket_id']
         
         # Now cancel the confirmed ticket
-        cancel_response = self.client.post(f'/api/v1/tickets/cancel/{confirmed_ticket_id}')
+        cancel_response = self.client.delete(f'/api/v1/tickets/cancel/{confirmed_ticket_id}')
         self.assertEqual(cancel_response.status_code, 200)
         
         # Check if RAC passenger was promoted to confirmed
-        get_tickets_response = self.client.get('/api/v1/tickets/booked')
-        tickets_data = json.loads(get_tickets_response.data)
+        confirmed_count = Ticket.query.filter_by(status=TicketStatus.CONFIRMED).count()
+        rac_count = Ticket.query.filter_by(status=TicketStatus.RAC).count()
+    
+        # The RAC ticket should now be the only confirmed ticket
+        self.assertEqual(confirmed_count, 1)
+        self.assertEqual(rac_count, 0)
         
-        # The RAC ticket should now be in confirmed list
-        self.assertEqual(len(tickets_data['confirmed']), 1)
-        self.assertEqual(len(tickets_data['rac']), 0)
+        # The booked listing should show the same
+        booked_response = self.client.get('/api/v1/tickets/booked')
+        self.assertEqual(booked_response.status_code, 200)
+        booked_data = booked_response.get_json()
+        self.assertEqual([t['ticket_id'] for t in booked_data['confirmed']], [rac_ticket_id])
+        self.assertEqual(booked_data['rac'], [])
+        self.assertEqual(booked_data['summary']['confirmed_count'], 1)
+        self.assertEqual(booked_data['summary']['rac_count'], 0)
 
 if __name__ == '__main__':
     unittest.main()